@@ -0,0 +1,87 @@
+"""
+Сравнение расхода памяти на узел VFS: исходный VFSNode и компактные DirNode/FileNode
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from vfs import DirNode, FileNode
+
+
+class LegacyVFSNode:
+    """Узел VFS в исходном виде (обычный объект с __dict__)"""
+    def __init__(self, name, is_directory=False, content=""):
+        self.name = name
+        self.is_directory = is_directory
+        self.content = content
+        self.children = {} if is_directory else None
+        self.parent = None
+
+
+def make_legacy_dir(name):
+    return LegacyVFSNode(name, is_directory=True)
+
+def make_legacy_file(name, content):
+    return LegacyVFSNode(name, content=content)
+
+def make_compact_dir(name):
+    return DirNode(name)
+
+def make_compact_file(name, content):
+    return FileNode(name, content)
+
+def build_tree(node_count, fan_out, make_dir, make_file):
+    """Построение дерева из node_count узлов: в каждой директории fan_out элементов"""
+    root = make_dir("")
+    queue = [root]
+    created = 1
+    index = 0
+
+    while created < node_count:
+        parent = queue[index]
+        index += 1
+        for i in range(fan_out):
+            if created >= node_count:
+                break
+            # Каждый десятый элемент - директория, остальные - файлы.
+            # Имена повторяются между директориями, как в реальных деревьях
+            if i % 10 == 0:
+                node = make_dir(f"dir_{i}")
+                queue.append(node)
+            else:
+                node = make_file(f"file_{i}.txt", f"Строка {created}\n")
+            node.parent = parent
+            parent.children[node.name] = node
+            created += 1
+
+    return root
+
+def measure(node_count, fan_out, make_dir, make_file):
+    """Память (байт), занятая деревом из node_count узлов"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    root = build_tree(node_count, fan_out, make_dir, make_file)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del root
+    gc.collect()
+    return after - before
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение памяти на узел VFS')
+    parser.add_argument('--nodes', type=int, default=1_000_000, help='Количество узлов')
+    parser.add_argument('--fan-out', type=int, default=50, help='Элементов в директории')
+    args = parser.parse_args()
+
+    legacy = measure(args.nodes, args.fan_out, make_legacy_dir, make_legacy_file)
+    compact = measure(args.nodes, args.fan_out, make_compact_dir, make_compact_file)
+
+    print(f"Узлов: {args.nodes}, элементов в директории: {args.fan_out}")
+    print(f"VFSNode (исходный):   {legacy / args.nodes:8.1f} байт/узел, всего {legacy / 2**20:8.1f} МБ")
+    print(f"DirNode/FileNode:     {compact / args.nodes:8.1f} байт/узел, всего {compact / 2**20:8.1f} МБ")
+    print(f"Экономия: {(1 - compact / legacy) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
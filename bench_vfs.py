@@ -0,0 +1,319 @@
+"""
+Набор бенчмарков VFS и пакетного режима с результатами в JSON
+
+Синтетическое дерево задается глубиной, числом поддиректорий и файлов в каждой
+директории и распределением размеров файлов; при одинаковом --seed оно одно и то же.
+Замеряются load_from_physical_path, change_directory, list_directory,
+get_file_stats, copy_file, log_event и полный прогон скрипта в пакетном режиме.
+Результаты сравниваются с сохраненными ранее через --compare.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from headless import HeadlessShell
+from vfs import VirtualFileSystem
+
+
+SIZE_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+WORDS = ("alpha", "beta", "gamma", "delta", "kernel", "shell", "emulator", "node",
+         "buffer", "cache", "index", "stream", "vector", "matrix", "token", "record")
+
+
+def file_size(rng, distribution, mean_size, max_size):
+    """Размер очередного файла по выбранному распределению"""
+    if distribution == "fixed":
+        size = mean_size
+    elif distribution == "uniform":
+        size = rng.randint(0, 2 * mean_size)
+    else:
+        # Медиана логнормального распределения - mean_size: много мелких файлов и редкие крупные
+        size = int(rng.lognormvariate(math.log(max(mean_size, 1)), 1.0))
+    return min(size, max_size)
+
+def file_text(rng, size):
+    """Текст из строк случайных слов размером ровно size байт (ASCII)"""
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))) + "\n"
+        lines.append(line)
+        length += len(line)
+    return "".join(lines)[:size]
+
+def generate_tree(path, depth=3, fan_out=4, files_per_dir=20, distribution="lognormal",
+                  mean_size=2048, max_size=1024 * 1024, seed=1):
+    """Создание синтетического дерева в физической директории path.
+    Возвращает (директорий, файлов, байт)"""
+    rng = random.Random(seed)
+    dirs = files = total_bytes = 0
+    stack = [(path, 0)]
+    while stack:
+        directory, level = stack.pop()
+        os.makedirs(directory, exist_ok=True)
+        dirs += 1
+        for i in range(files_per_dir):
+            size = file_size(rng, distribution, mean_size, max_size)
+            with open(os.path.join(directory, f"file_{i}.txt"), 'w', encoding='utf-8') as f:
+                f.write(file_text(rng, size))
+            files += 1
+            total_bytes += size
+        if level < depth:
+            for i in range(fan_out):
+                stack.append((os.path.join(directory, f"dir_{i}"), level + 1))
+    return dirs, files, total_bytes
+
+def vfs_paths(vfs):
+    """Пути всех директорий и файлов дерева в VFS"""
+    dirs, files = [], []
+    stack = [("", vfs.root)]
+    while stack:
+        path, node = stack.pop()
+        for name, child in node.children.items():
+            child_path = f"{path}/{name}"
+            if child.is_directory:
+                dirs.append(child_path)
+                stack.append((child_path, child))
+            else:
+                files.append(child_path)
+    dirs.sort()
+    files.sort()
+    return dirs, files
+
+def write_script(path, dirs, files, commands):
+    """Скрипт для пакетного прогона: переходы, ls, cat, wc, find и grep по дереву"""
+    lines = []
+    for i in range(commands):
+        directory = dirs[i % len(dirs)] if dirs else "/"
+        lines.append(f"cd {directory}")
+        lines.append("ls -l")
+        if files:
+            target = files[i % len(files)]
+            lines.append(f"wc {target}")
+            lines.append(f"cat {target} | grep shell | wc -l")
+        if i % 10 == 0:
+            lines.append("find . -name file_1*.txt")
+        lines.append("cd /")
+    lines.append("exit")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return len(lines)
+
+def result(ops, times):
+    """Сводка замеров одного бенчмарка"""
+    median = statistics.median(times)
+    return {
+        "ops": ops,
+        "runs": len(times),
+        "first_s": times[0],
+        "min_s": min(times),
+        "median_s": median,
+        "mean_s": statistics.fmean(times),
+        "max_s": max(times),
+        "ops_per_sec": ops / median if median else None,
+    }
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def quiet():
+    """Служебные сообщения VFS и эмулятора не смешиваются с отчетом"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+def bench_load(tree, repeat, workers):
+    times = []
+    for _ in range(repeat):
+        vfs = VirtualFileSystem(load_workers=workers)
+        with quiet():
+            times.append(timed(lambda: vfs.load_from_physical_path(
+                tree, progress=lambda *args: None)))
+    return vfs, times
+
+def bench_vfs(vfs, repeat):
+    """Операции над уже загруженным деревом"""
+    dirs, files = vfs_paths(vfs)
+    results = {}
+
+    def change_all():
+        for path in dirs:
+            vfs.change_directory(path)
+        vfs.change_directory("/")
+    results["change_directory"] = result(len(dirs), [timed(change_all) for _ in range(repeat)])
+
+    def list_all():
+        for path in dirs:
+            vfs.list_directory(path, long_format=True)
+    results["list_directory"] = result(len(dirs), [timed(list_all) for _ in range(repeat)])
+
+    # Первый прогон считает строки и слова, следующие берут их из кэша узла
+    def stats_all():
+        for path in files:
+            vfs.get_file_stats(path)
+    results["get_file_stats"] = result(len(files), [timed(stats_all) for _ in range(repeat)])
+
+    times = []
+    for run in range(repeat):
+        target = f"bench_copy_{run}"
+        vfs.mkdir(target, vfs.root)
+
+        def copy_all():
+            for i, path in enumerate(files):
+                vfs.copy_file(path, f"/{target}/{i}")
+        times.append(timed(copy_all))
+        vfs.remove_tree(f"/{target}", recursive=True)
+    results["copy_file"] = result(len(files), times)
+    return results
+
+def bench_log_event(workdir, repeat, events, log_format="xml"):
+    log_path = os.path.join(workdir, f"bench_log.{log_format}")
+    with quiet():
+        shell = HeadlessShell(io.StringIO(), log_file=log_path, log_format=log_format)
+
+    def log_all():
+        for i in range(events):
+            shell.log_event("bench", f"Событие {i}")
+    times = [timed(log_all) for _ in range(repeat)]
+    shell.close_log()
+    return result(events, times)
+
+def bench_headless(tree, workdir, repeat, commands, workers):
+    """Полный прогон: запуск эмулятора, загрузка VFS, скрипт и закрытие лога"""
+    vfs = VirtualFileSystem()
+    with quiet():
+        vfs.load_from_physical_path(tree, progress=lambda *args: None)
+    dirs, files = vfs_paths(vfs)
+    # Пути в скрипте - относительно корня VFS эмулятора, куда загружается дерево
+    script = os.path.join(workdir, "bench_script.sh")
+    lines = write_script(script, dirs, files, commands)
+    log_path = os.path.join(workdir, "bench_script.xml")
+
+    def run():
+        shell = HeadlessShell(io.StringIO(), tree, log_path, script, vfs_workers=workers)
+        shell.run()
+    times = []
+    for _ in range(repeat):
+        with quiet():
+            times.append(timed(run))
+    return result(lines, times)
+
+def git_commit():
+    """Текущий коммит репозитория, если он доступен"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Сравнение медиан с сохраненными результатами; возвращает число регрессий"""
+    regressions = 0
+    print(f"\nСравнение с {baseline.get('meta', {}).get('commit') or 'базовыми результатами'}:")
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None or not previous.get("median_s"):
+            print(f"  {name:<18} нет в базовых результатах")
+            continue
+        ratio = current["median_s"] / previous["median_s"]
+        mark = ""
+        if ratio > threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions += 1
+        print(f"  {name:<18} {ratio:6.2f}x{mark}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки VFS и пакетного режима')
+    parser.add_argument('--tree', help='Физическая директория дерева: используется, если существует, '
+                                       'иначе создается (по умолчанию - временная)')
+    parser.add_argument('--depth', type=int, default=3, help='Глубина вложенности директорий')
+    parser.add_argument('--fan-out', type=int, default=4, help='Поддиректорий в директории')
+    parser.add_argument('--files', type=int, default=20, help='Файлов в директории')
+    parser.add_argument('--size-dist', choices=SIZE_DISTRIBUTIONS, default='lognormal',
+                        help='Распределение размеров файлов')
+    parser.add_argument('--file-size', type=int, default=2048,
+                        help='Размер файла в байтах (медиана для lognormal, среднее для uniform)')
+    parser.add_argument('--max-size', type=int, default=1024 * 1024, help='Наибольший размер файла')
+    parser.add_argument('--seed', type=int, default=1, help='Начальное значение генератора')
+    parser.add_argument('--repeat', type=int, default=5, help='Прогонов каждого бенчмарка')
+    parser.add_argument('--log-events', type=int, default=10000, help='Событий лога за прогон')
+    parser.add_argument('--script-commands', type=int, default=200,
+                        help='Групп команд в скрипте пакетного прогона')
+    parser.add_argument('--log-format', choices=('xml', 'jsonl', 'binary'), default='xml',
+                        help='Формат лога для бенчмарка log_event')
+    parser.add_argument('--workers', type=int, help='Потоков чтения файлов при загрузке VFS')
+    parser.add_argument('--output', help='Файл для результатов в JSON (по умолчанию - stdout)')
+    parser.add_argument('--compare', help='JSON с результатами другого коммита для сравнения')
+    parser.add_argument('--threshold', type=float, default=1.10,
+                        help='Во сколько раз медиана может вырасти без отметки о регрессии')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_vfs_") as workdir:
+        tree = args.tree or os.path.join(workdir, "tree")
+        generated = None
+        if not os.path.isdir(tree):
+            generated = generate_tree(tree, args.depth, args.fan_out, args.files, args.size_dist,
+                                      args.file_size, args.max_size, args.seed)
+            print(f"Дерево {tree}: директорий {generated[0]}, файлов {generated[1]}, "
+                  f"{generated[2] / 2**20:.1f} МБ", file=sys.stderr)
+
+        results = {}
+        vfs, times = bench_load(tree, args.repeat, args.workers)
+        dirs, files = vfs_paths(vfs)
+        # Файлы базовой структуры VFS не относятся к загруженному дереву
+        loaded = len(files) - len(vfs_paths(VirtualFileSystem())[1])
+        results["load_from_physical_path"] = result(loaded, times)
+        results.update(bench_vfs(vfs, args.repeat))
+        results["log_event"] = bench_log_event(workdir, args.repeat, args.log_events,
+                                               args.log_format)
+        results["headless_script"] = bench_headless(tree, workdir, args.repeat,
+                                                    args.script_commands, args.workers)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {name: value for name, value in vars(args).items()
+                       if name not in ("output", "compare", "threshold")},
+            "tree": {"dirs": len(dirs), "files": len(files)},
+        },
+        "results": results,
+    }
+
+    for name, item in results.items():
+        print(f"{name:<24} {item['ops']:>8} оп.  медиана {item['median_s'] * 1000:10.2f} мс  "
+              f"{item['ops_per_sec'] or 0:12.0f} оп/с", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with contextlib.redirect_stdout(sys.stderr):
+            regressions = compare(results, baseline, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Проверка индекса VFS: find и grep с индексом и без него должны давать одно и то же
+"""
+
+import argparse
+import random
+import sys
+
+from vfs import VirtualFileSystem
+
+
+WORDS = ("foobar", "foooobar", "fobar", "FooBar", "a]bxyz", "b]xyz", "abc{2}", "shell",
+         "kernel", "emulator", "cache", "x.y.z", "line_10", "tab\there", "привет", "мир",
+         "Abcd")
+
+GREP_PATTERNS = [
+    # (шаблон, регулярное выражение, без учета регистра)
+    ("foobar", False, False),
+    ("foobar", False, True),
+    ("b]xyz", False, False),
+    ("fo{2,}bar", True, False),
+    ("fo{1,2}bar", True, True),
+    ("fo+bar", True, False),
+    ("fo*bar", True, False),
+    ("fo?bar", True, False),
+    ("[a\\]b]xyz", True, False),
+    ("[^]]xyz", True, False),
+    ("abc\\{2\\}", True, False),
+    ("abc{2}", True, False),
+    ("(foo|fo)bar", True, False),
+    ("x\\.y\\.z", True, False),
+    ("x.y.z", True, False),
+    ("line_1\\d", True, False),
+    ("приве?т", True, False),
+    ("(?i)foobar", True, False),
+    ("ker(nel)?", True, False),
+    ("\\x41bcd", True, False),
+    ("\\101bcd", True, False),
+    ("\\u0041bcd", True, False),
+    ("\\U00000041bcd", True, False),
+    ("\\N{LATIN CAPITAL LETTER A}bcd", True, False),
+]
+
+FIND_PATTERNS = ["file_1*", "*.txt", "*_7.log", "dir_?", "f*e*", "missing*", "[fd]*_3*"]
+
+
+def build_vfs(seed, dirs, files_per_dir):
+    """Случайное дерево в памяти: директории dir_N и файлы из слов WORDS"""
+    rng = random.Random(seed)
+    vfs = VirtualFileSystem()
+    directories = [vfs.mkdir("data", vfs.root)]
+    for i in range(dirs):
+        directories.append(vfs.mkdir(f"dir_{i}", rng.choice(directories)))
+    for directory in directories:
+        for i in range(files_per_dir):
+            lines = (" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+                     for _ in range(rng.randint(0, 8)))
+            name = f"file_{i}.{rng.choice(('txt', 'log', 'md'))}"
+            vfs.create_file(name, directory, "\n".join(lines))
+    return vfs
+
+def results(vfs):
+    """Ответы find и grep по всем шаблонам"""
+    answers = []
+    for pattern, regex, ignore_case in GREP_PATTERNS:
+        answers.append(list(vfs.grep(pattern, "/", regex, ignore_case)))
+    for pattern in FIND_PATTERNS:
+        answers.append(vfs.find("/", pattern))
+    return answers
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение find и grep с индексом и без него')
+    parser.add_argument('--seed', type=int, default=1, help='Начальное значение генератора')
+    parser.add_argument('--dirs', type=int, default=40, help='Количество директорий')
+    parser.add_argument('--files', type=int, default=15, help='Файлов в директории')
+    args = parser.parse_args()
+
+    vfs = build_vfs(args.seed, args.dirs, args.files)
+    vfs.enable_index()
+    # Индекс проверяется и после изменений дерева
+    vfs.copy_tree("/data", "/copy")
+    vfs.remove_tree("/copy/file_0.txt")
+    vfs.move_node("/copy", "/moved")
+    indexed = results(vfs)
+    vfs.index = None
+    plain = results(vfs)
+
+    labels = [f"grep {p!r} regex={r} i={c}" for p, r, c in GREP_PATTERNS]
+    labels += [f"find -name {p!r}" for p in FIND_PATTERNS]
+    failures = 0
+    for label, expected, actual in zip(labels, plain, indexed):
+        if expected != actual:
+            failures += 1
+            print(f"Расхождение: {label}: без индекса {len(expected)}, с индексом {len(actual)}")
+    if failures:
+        return 1
+    print(f"Шаблонов: {len(labels)}, результаты с индексом и без него совпадают")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
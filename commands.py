@@ -0,0 +1,98 @@
+"""
+Реестр команд эмулятора
+
+Команда регистрируется декоратором command и вызывается как handler(shell, args).
+Обработчик-генератор выдает вывод порциями текста, поэтому его можно
+перенаправить в файл (>, >>) или передать следующей команде конвейера (|);
+если у обработчика есть параметр stdin, он получает порции предыдущей команды
+(или None). Сообщения об ошибках выводятся через shell.output и в конвейер
+не попадают. Сторонние команды подключаются так же, без изменения класса оболочки:
+
+    from commands import command
+
+    @command("hello", "hello [имя]", "приветствие")
+    def cmd_hello(shell, args):
+        yield f"Привет, {' '.join(args) or 'мир'}!\n"
+
+Обработчик, который сам вызывает shell.output и ничего не выдает, тоже
+поддерживается, но его вывод не участвует в конвейерах. Имя команды
+регистрируется один раз: повторная регистрация (например, встроенной команды
+модулем расширения) - ошибка ValueError.
+"""
+
+import inspect
+
+
+class Command:
+    """Описание команды: имя, обработчик, справка и допустимые однобуквенные опции"""
+    def __init__(self, name, handler, usage="", description="", options=""):
+        self.name = name
+        self.handler = handler
+        self.usage = usage or name
+        self.description = description
+        self.options = options
+        # Принимает ли обработчик вывод предыдущей команды конвейера
+        self.reads_stdin = 'stdin' in inspect.signature(handler).parameters
+
+    def parse(self, args):
+        """Разделение аргументов на множество опций и список операндов"""
+        flags = set()
+        operands = []
+        for arg in args:
+            if arg.startswith('-'):
+                flags.update(ch for ch in arg[1:] if ch in self.options)
+            else:
+                operands.append(arg)
+        return flags, operands
+
+    def run(self, shell, args, stdin=None):
+        """Запуск обработчика; возвращает итератор порций вывода"""
+        if self.reads_stdin:
+            result = self.handler(shell, args, stdin=stdin)
+        else:
+            result = self.handler(shell, args)
+        # Обработчик без генератора уже вывел все сам
+        return result if inspect.isgenerator(result) else iter(())
+
+    def help_line(self, width=18):
+        return f"  {self.usage:<{width}} - {self.description}"
+
+class CommandRegistry:
+    """Таблица команд: поиск обработчика по имени за O(1)"""
+    def __init__(self):
+        self._commands = {}
+
+    def register(self, name, handler, usage="", description="", options=""):
+        if name in self._commands:
+            raise ValueError(f"команда '{name}' уже зарегистрирована")
+        cmd = Command(name, handler, usage, description, options)
+        self._commands[name] = cmd
+        return cmd
+
+    def command(self, name, usage="", description="", options=""):
+        """Декоратор регистрации обработчика команды"""
+        def decorator(handler):
+            self.register(name, handler, usage, description, options)
+            return handler
+        return decorator
+
+    def get(self, name):
+        return self._commands.get(name)
+
+    def __contains__(self, name):
+        return name in self._commands
+
+    def __iter__(self):
+        return iter(self._commands.values())
+
+    def help_text(self):
+        """Справка по всем зарегистрированным командам"""
+        lines = ["Доступные команды:"]
+        # Колонка описаний выравнивается по самой длинной строке использования
+        width = max((len(cmd.usage) for cmd in self), default=0)
+        lines.extend(cmd.help_line(width) for cmd in self)
+        return "\n".join(lines) + "\n"
+
+# Общий реестр встроенных и подключаемых команд
+COMMANDS = CommandRegistry()
+command = COMMANDS.command
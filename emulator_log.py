@@ -0,0 +1,659 @@
+"""
+Запись журнала команд эмулятора
+
+Форматы лога (--log-format):
+    xml    - документ emulator_log, по элементу event на событие
+    jsonl  - JSON Lines: строка на событие, повторяющиеся строки (команды, пути,
+             сообщения) записываются один раз и дальше заменяются номерами
+    binary - то же в двоичных записях фиксированной структуры
+Сжатые форматы читаются read_log и переводятся в XML программой log_convert.py.
+"""
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import re
+import shutil
+import struct
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+# Что делает AsyncLogSink, когда очередь событий заполнена
+LOG_POLICIES = ("block", "drop-new", "drop-old")
+
+
+def format_timestamp(timestamp):
+    """Время события в виде ISO 8601: строка остается как есть,
+    число - время time.time(), None - текущее время"""
+    if isinstance(timestamp, str):
+        return timestamp
+    if timestamp is None:
+        return datetime.now().isoformat()
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+class LogWriter:
+    """Потоковая запись лога: события дописываются в конец открытого файла.
+    Кодирование события задают подклассы (encode_event), HEADER и FOOTER.
+
+    При ротации (max_bytes - по размеру, max_age - по времени в секундах)
+    заполненный файл переименовывается в сегмент 'имя.ГГГГММДДTЧЧММСС.N.xml',
+    а запись продолжается в новый файл по исходному пути; каждый сегмент -
+    законченный документ. Сегменты сжимаются gzip в отдельном потоке
+    (compress), хранятся не более backups последних (None - все)."""
+
+    HEADER = b""
+    FOOTER = b""
+
+    def __init__(self, path, flush_events=64, flush_interval=1.0,
+                 max_bytes=None, max_age=None, backups=None, compress=False):
+        self.path = path
+        self.flush_events = flush_events
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.compress = compress
+        self._pending = []
+        self._pending_size = 0
+        self._last_flush = time.monotonic()
+        self._segment_seq = 0
+        self._compressor = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        root, ext = os.path.splitext(os.path.basename(path))
+        self._segment_pattern = re.compile(
+            re.escape(root) + r"\.\d{8}T\d{6}\.(\d+)" + re.escape(ext) + r"(?:\.gz)?$")
+        # Номера сегментов продолжаются после прошлых запусков и задают их порядок
+        if self.rotating:
+            self._segment_seq = max((seq for seq, _ in self._list_segments()), default=0)
+        # Лог прошлого запуска при ротации сохраняется сегментом, а не затирается
+        if self.rotating and os.path.exists(path) and os.path.getsize(path) > len(self.HEADER):
+            self._archive(path)
+        self._open()
+
+        # Закрывающий тег должен оказаться в файле при любом завершении процесса
+        atexit.register(self.close)
+
+    @property
+    def rotating(self):
+        return bool(self.max_bytes or self.max_age)
+
+    def _open(self):
+        self._start_segment()
+        self._file = open(self.path, 'wb')
+        self._file.write(self.HEADER)
+        self._opened = time.monotonic()
+        # Позиция, с которой начинается закрывающий тег
+        self._tail = self._file.tell()
+        self._write_footer()
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def write_event(self, command, message, error=None, current_dir="/", timestamp=None, extra=None):
+        """Добавление события в очередь на запись; extra - дополнительные поля (имя -> текст),
+        timestamp - строка ISO 8601 или время time.time()"""
+        if self._file is None:
+            return
+
+        data = self.encode_event(command, message, error, current_dir, timestamp, extra)
+        # Событие, с которым файл превысил бы max_bytes, начинает новый сегмент.
+        # Определения строк сжатых форматов привязаны к файлу, поэтому после
+        # ротации событие кодируется заново
+        if (self.max_bytes and (self._pending or self._tail > len(self.HEADER))
+                and self._tail + self._pending_size + len(data) + len(self.FOOTER) > self.max_bytes):
+            self.flush()
+            if self._tail > len(self.HEADER):
+                self._rotate()
+            data = self.encode_event(command, message, error, current_dir, timestamp, extra)
+        self._pending.append(data)
+        self._pending_size += len(data)
+
+        if (len(self._pending) >= self.flush_events
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Запись накопленных событий на диск"""
+        if self._file is None:
+            return
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+
+        data = b"".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+
+        # Дописываем события поверх закрывающего тега и возвращаем его на место,
+        # чтобы файл на диске всегда оставался корректным документом
+        self._file.seek(self._tail)
+        self._file.write(data)
+        self._tail = self._file.tell()
+        self._write_footer()
+        if self.rotating:
+            self._check_rotation()
+
+    def _check_rotation(self):
+        """Переход к новому файлу, если текущий достиг предела размера или возраста"""
+        if self._tail <= len(self.HEADER):
+            return
+        size = self._tail + len(self.FOOTER)
+        if ((self.max_bytes and size >= self.max_bytes)
+                or (self.max_age and time.monotonic() - self._opened >= self.max_age)):
+            self._rotate()
+
+    def _rotate(self):
+        """Закрытие текущего файла сегментом и открытие нового"""
+        self._file.close()
+        self._archive(self.path)
+        self._open()
+
+    def _archive(self, path):
+        """Переименование законченного файла в сегмент; сжатие и удаление
+        старых сегментов выполняются вне потока записи"""
+        directory, name = os.path.split(path)
+        root, ext = os.path.splitext(name)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        while True:
+            self._segment_seq += 1
+            segment = os.path.join(directory, f"{root}.{stamp}.{self._segment_seq}{ext}")
+            if not os.path.exists(segment) and not os.path.exists(segment + ".gz"):
+                break
+        os.replace(path, segment)
+
+        if self.compress or self.backups is not None:
+            if self._compressor is None:
+                self._compressor = ThreadPoolExecutor(1, thread_name_prefix="log-compress")
+            self._compressor.submit(self._finish_segment, segment)
+
+    def _finish_segment(self, segment):
+        try:
+            if self.compress:
+                with open(segment, 'rb') as src, gzip.open(segment + ".gz.tmp", 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(segment + ".gz.tmp", segment + ".gz")
+                os.remove(segment)
+            if self.backups is not None:
+                self._prune()
+        except OSError as e:
+            print(f"Ошибка обработки сегмента лога {segment}: {e}", file=sys.stderr)
+
+    def segments(self):
+        """Пути сегментов лога от старых к новым"""
+        return [path for _, path in sorted(self._list_segments())]
+
+    def _list_segments(self):
+        directory = os.path.dirname(self.path) or "."
+        for name in os.listdir(directory):
+            match = self._segment_pattern.match(name)
+            if match:
+                yield int(match.group(1)), os.path.join(directory, name)
+
+    def _prune(self):
+        """Удаление самых старых сегментов сверх backups"""
+        segments = self.segments()
+        for segment in segments[:max(len(segments) - self.backups, 0)]:
+            os.remove(segment)
+
+    def sync(self):
+        """Запись всех принятых событий на диск до возврата"""
+        self.flush()
+
+    def close(self):
+        """Сброс буфера и закрытие файла"""
+        if self._file is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+            self._file = None
+            atexit.unregister(self.close)
+            # Все закрытые сегменты сжимаются до выхода
+            if self._compressor is not None:
+                self._compressor.shutdown(wait=True)
+
+    def _write_footer(self):
+        self._file.write(self.FOOTER)
+        self._file.truncate()
+        self._file.flush()
+
+    def _start_segment(self):
+        """Начало нового файла (подклассы сбрасывают состояние, привязанное к файлу)"""
+
+    def encode_event(self, command, message, error, current_dir, timestamp, extra):
+        """Запись события в байтах"""
+        raise NotImplementedError
+
+class XMLLogWriter(LogWriter):
+    """XML-лог: документ emulator_log с элементом event на каждое событие"""
+
+    HEADER = b"<?xml version='1.0' encoding='utf-8'?>\n<emulator_log>"
+    FOOTER = b"</emulator_log>"
+
+    def encode_event(self, command, message, error, current_dir, timestamp, extra):
+        event = ET.Element("event")
+        ET.SubElement(event, "timestamp").text = format_timestamp(timestamp)
+        ET.SubElement(event, "command").text = command
+        ET.SubElement(event, "message").text = message
+        if error:
+            ET.SubElement(event, "error").text = error
+        ET.SubElement(event, "current_dir").text = current_dir
+        if extra:
+            for name, value in extra.items():
+                ET.SubElement(event, name).text = value
+        return ET.tostring(event, encoding='utf-8')
+
+class CompactLogWriter(LogWriter):
+    """Основа сжатых форматов: таблица повторяющихся строк своя у каждого файла,
+    строка получает номер при первой записи. Длинные сообщения и строки сверх
+    INTERN_LIMIT записываются как есть"""
+
+    INTERN_LIMIT = 65536
+    INTERN_MAX_LENGTH = 128
+
+    def _start_segment(self):
+        self._strings = {}
+
+    def _intern(self, text, definitions):
+        """Номер строки или None, если строка пишется как есть;
+        новая строка добавляет запись-определение в definitions"""
+        number = self._strings.get(text)
+        if number is None:
+            if len(self._strings) >= self.INTERN_LIMIT or len(text) > self.INTERN_MAX_LENGTH:
+                return None
+            number = self._strings[text] = len(self._strings)
+            definitions.append(self.encode_string(number, text))
+        return number
+
+    def encode_string(self, number, text):
+        raise NotImplementedError
+
+class JSONLinesLogWriter(CompactLogWriter):
+    """Лог JSON Lines: {"s": номер, "v": строка} - определение строки,
+    {"t": время, "c": команда, "m": сообщение, "d": директория, "e": ошибка,
+    "x": поля} - событие; строковые поля - номер из таблицы или сама строка"""
+
+    HEADER = b'{"format":"emulator_log","version":1}\n'
+
+    def encode_string(self, number, text):
+        return json.dumps({"s": number, "v": text}, ensure_ascii=False,
+                          separators=(',', ':')) + "\n"
+
+    def encode_event(self, command, message, error, current_dir, timestamp, extra):
+        definitions = []
+
+        def ref(text):
+            number = self._intern(text, definitions)
+            return text if number is None else number
+
+        record = {
+            "t": time.time() if timestamp is None else timestamp,
+            "c": ref(command),
+            "m": ref(message),
+            "d": ref(current_dir),
+        }
+        if error:
+            record["e"] = ref(error)
+        if extra:
+            record["x"] = extra
+        definitions.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+        return "".join(definitions).encode('utf-8')
+
+class BinaryLogWriter(CompactLogWriter):
+    """Двоичный лог после заголовка b'EMLB' и номера версии (u16 little-endian).
+    Числа, кроме времени, - varint (по 7 бит, младшие первыми):
+        'S' длина, UTF-8              - определение строки (номера идут подряд с 0)
+        'E' флаги, f64 время, ссылки на команду, сообщение и директорию,
+            [ошибку], [время строкой], [число полей, пары ссылок имя-значение]
+    Ссылка - номер строки * 2 или длина * 2 + 1 для строки, идущей следом"""
+
+    MAGIC = b"EMLB"
+    VERSION = 1
+    HEADER = MAGIC + struct.pack('<H', VERSION)
+
+    HAS_ERROR = 1
+    HAS_EXTRA = 2
+    TEXT_TIME = 4
+
+    _TIME = struct.Struct('<d')
+
+    def encode_string(self, number, text):
+        data = text.encode('utf-8')
+        out = bytearray(b"S")
+        _write_varint(out, len(data))
+        return bytes(out + data)
+
+    def _ref(self, text, definitions, out, intern=True):
+        number = self._intern(text, definitions) if intern else None
+        if number is not None:
+            _write_varint(out, number << 1)
+        else:
+            data = text.encode('utf-8')
+            _write_varint(out, len(data) << 1 | 1)
+            out += data
+
+    def encode_event(self, command, message, error, current_dir, timestamp, extra):
+        definitions = []
+        flags = 0
+        if error:
+            flags |= self.HAS_ERROR
+        if extra:
+            flags |= self.HAS_EXTRA
+        if isinstance(timestamp, str):
+            flags |= self.TEXT_TIME
+            seconds = 0.0
+        else:
+            seconds = time.time() if timestamp is None else timestamp
+
+        out = bytearray(b"E")
+        out.append(flags)
+        out += self._TIME.pack(seconds)
+        self._ref(command, definitions, out)
+        self._ref(message, definitions, out)
+        self._ref(current_dir, definitions, out)
+        if error:
+            self._ref(error, definitions, out)
+        if flags & self.TEXT_TIME:
+            self._ref(timestamp, definitions, out, intern=False)
+        if extra:
+            _write_varint(out, len(extra))
+            for name, value in extra.items():
+                self._ref(name, definitions, out)
+                self._ref(value, definitions, out, intern=False)
+        definitions.append(bytes(out))
+        return b"".join(definitions)
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_exact(f, size):
+    """Ровно size байт; короткое чтение - оборванная запись"""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("двоичный лог обрывается посреди записи")
+    return data
+
+def _read_varint(f):
+    value = shift = 0
+    while True:
+        byte = _read_exact(f, 1)
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+LOG_FORMATS = {
+    "xml": XMLLogWriter,
+    "jsonl": JSONLinesLogWriter,
+    "binary": BinaryLogWriter,
+}
+
+def open_log(path):
+    """Файл лога для чтения; сжатые gzip сегменты распаковываются на лету"""
+    f = open(path, 'rb')
+    if f.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=f)
+    return f
+
+def read_log(path):
+    """События лога любого формата: кортежи (время ISO 8601, команда,
+    сообщение, ошибка или None, директория, поля или None)"""
+    with open_log(path) as f:
+        head = f.read(len(BinaryLogWriter.MAGIC))
+        if head == BinaryLogWriter.MAGIC:
+            yield from _read_binary(f)
+        elif head[:1] == b"{":
+            yield from _read_jsonl(head + f.readline(), f)
+        else:
+            yield from _read_xml(head, f)
+
+def _read_xml(head, f):
+    known = ("timestamp", "command", "message", "error", "current_dir")
+    parser = ET.XMLPullParser(events=("end",))
+    data = head
+    while data:
+        parser.feed(data)
+        for _, element in parser.read_events():
+            if element.tag != "event":
+                continue
+            fields = {child.tag: child.text or "" for child in element}
+            extra = {name: value for name, value in fields.items() if name not in known}
+            yield (fields.get("timestamp", ""), fields.get("command", ""),
+                   fields.get("message", ""), fields.get("error"),
+                   fields.get("current_dir", ""), extra or None)
+            element.clear()
+        data = f.read(1024 * 1024)
+
+def _read_jsonl(header, f):
+    if json.loads(header).get("format") != "emulator_log":
+        raise ValueError("файл не является логом эмулятора в формате JSON Lines")
+    strings = []
+
+    def text(value):
+        return strings[value] if isinstance(value, int) else value
+
+    for line in f:
+        record = json.loads(line)
+        if "s" in record:
+            strings.append(record["v"])
+            continue
+        error = record.get("e")
+        yield (format_timestamp(record["t"]), text(record["c"]), text(record["m"]),
+               None if error is None else text(error), text(record["d"]), record.get("x"))
+
+def _read_binary(f):
+    writer = BinaryLogWriter
+    version, = struct.unpack('<H', _read_exact(f, 2))
+    if version != writer.VERSION:
+        raise ValueError(f"неподдерживаемая версия двоичного лога: {version}")
+    strings = []
+
+    def ref():
+        value = _read_varint(f)
+        if value & 1:
+            return _read_exact(f, value >> 1).decode('utf-8')
+        if value >> 1 >= len(strings):
+            raise ValueError(f"ссылка на неопределенную строку двоичного лога: {value >> 1}")
+        return strings[value >> 1]
+
+    while True:
+        kind = f.read(1)
+        if not kind:
+            return
+        if kind == b"S":
+            strings.append(_read_exact(f, _read_varint(f)).decode('utf-8'))
+            continue
+        if kind != b"E":
+            raise ValueError(f"поврежденная запись двоичного лога: {kind!r}")
+        flags = _read_exact(f, 1)[0]
+        seconds, = writer._TIME.unpack(_read_exact(f, writer._TIME.size))
+        command, message, current_dir = ref(), ref(), ref()
+        error = ref() if flags & writer.HAS_ERROR else None
+        if flags & writer.TEXT_TIME:
+            timestamp = ref()
+        else:
+            try:
+                timestamp = format_timestamp(seconds)
+            except (OverflowError, OSError) as e:
+                raise ValueError(f"поврежденное время события двоичного лога: {seconds}") from e
+        extra = None
+        if flags & writer.HAS_EXTRA:
+            extra = {}
+            for _ in range(_read_varint(f)):
+                name = ref()
+                extra[name] = ref()
+        yield timestamp, command, message, error, current_dir, extra
+
+class AsyncLogSink:
+    """Неблокирующая запись лога: события попадают в ограниченную очередь,
+    которую разбирает фоновый поток, и только он обращается к файлу (writer -
+    любой из LOG_FORMATS).
+
+    Политика при заполненной очереди:
+        block    - команда ждет, пока поток освободит место (ничего не теряется)
+        drop-new - новое событие отбрасывается
+        drop-old - отбрасывается самое старое событие в очереди
+    Отброшенные события считаются в dropped, записанные позже late_after секунд
+    после вызова write_event - в late; при закрытии счетчики пишутся в лог."""
+
+    def __init__(self, writer, max_events=10000, policy="block", late_after=1.0):
+        if policy not in LOG_POLICIES:
+            raise ValueError(f"неизвестная политика очереди лога '{policy}'")
+        self.writer = writer
+        self.policy = policy
+        self.late_after = late_after
+        self.dropped = 0
+        self.late = 0
+        # В очереди только события; запросы flush, sync и остановки передаются
+        # флагами, а None в очереди лишь будит поток и может быть потерян
+        self._queue = queue.Queue(max_events)
+        self._closed = False
+        self._stopping = False
+        self._flush_requested = False
+        self._sync_done = threading.Condition()
+        self._sync_target = 0
+        self._synced = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        # Очередь разбирается до закрытия файла: atexit вызывает обработчики в обратном порядке
+        atexit.register(self.close)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def write_event(self, command, message, error=None, current_dir="/", timestamp=None, extra=None):
+        """Постановка события в очередь; время берется сразу, форматируется в потоке записи"""
+        if self._closed:
+            return
+        event = (time.time(), command, message, error, current_dir, timestamp, extra)
+        if self.policy == "block":
+            self._queue.put(event)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            if self.policy == "drop-new":
+                self.dropped += 1
+                return
+            # drop-old: место освобождается за счет самого старого события;
+            # вынутая метка пробуждения не нужна - очередь полна, поток и так занят
+            while True:
+                try:
+                    if self._queue.get_nowait() is not None:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+                try:
+                    self._queue.put_nowait(event)
+                    return
+                except queue.Full:
+                    continue
+
+    def flush(self):
+        """Запрос записи накопленных событий на диск (без ожидания)"""
+        if not self._closed:
+            self._flush_requested = True
+            self._wake()
+
+    def sync(self):
+        """Запись всех поставленных в очередь событий на диск до возврата"""
+        if self._closed:
+            return
+        with self._sync_done:
+            self._sync_target += 1
+            target = self._sync_target
+        self._wake()
+        with self._sync_done:
+            self._sync_done.wait_for(lambda: self._synced >= target or self._stopped)
+
+    def close(self):
+        """Разбор оставшейся очереди, запись счетчиков потерь и закрытие файла"""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._stopping = True
+        self._wake()
+        self._thread.join()
+        try:
+            if self.dropped or self.late:
+                self.writer.write_event("log", "Статистика очереди лога", extra={
+                    'dropped': str(self.dropped), 'late': str(self.late)})
+        finally:
+            self.writer.close()
+
+    def _wake(self):
+        """Пробуждение потока записи; полная очередь и так не дает ему ждать"""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        """Поток записи: события пишутся в порядке поступления, в простое буфер сбрасывается"""
+        writer = self.writer
+        while True:
+            try:
+                item = self._queue.get(timeout=writer.flush_interval)
+            except queue.Empty:
+                item = None
+            try:
+                if item is not None:
+                    self._write(item)
+                if self._stopping:
+                    # Дописываются события, поставленные до закрытия
+                    try:
+                        self._drain()
+                    finally:
+                        with self._sync_done:
+                            self._stopped = True
+                            self._sync_done.notify_all()
+                    return
+                target = self._sync_target
+                if target != self._synced:
+                    # Все события, принятые до запроса sync, уже в очереди
+                    self._drain(self._queue.qsize())
+                if item is None or self._flush_requested or target != self._synced:
+                    self._flush_requested = False
+                    writer.flush()
+                if target != self._synced:
+                    with self._sync_done:
+                        self._synced = target
+                        self._sync_done.notify_all()
+            except Exception as e:
+                print(f"Ошибка записи лога: {e}", file=sys.stderr)
+
+    def _drain(self, limit=None):
+        """Запись событий из очереди без ожидания (не больше limit элементов)"""
+        count = 0
+        while limit is None or count < limit:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            count += 1
+            if item is not None:
+                self._write(item)
+
+    def _write(self, item):
+        created, command, message, error, current_dir, timestamp, extra = item
+        if time.time() - created > self.late_after:
+            self.late += 1
+        # Время форматирует (или хранит числом) сам формат лога
+        self.writer.write_event(command, message, error, current_dir,
+                                timestamp or created, extra)
@@ -0,0 +1,56 @@
+"""
+Пакетный запуск эмулятора без графического интерфейса
+"""
+
+import sys
+import contextlib
+
+from shell_core import ShellCore
+
+
+class HeadlessShell(ShellCore):
+    """Эмулятор, выводящий текст в поток вместо окна tkinter"""
+    def __init__(self, stream, vfs_path=None, log_file=None, startup_script=None, **options):
+        self.stream = stream
+        super().__init__(vfs_path, log_file, startup_script, **options)
+
+    def output(self, text):
+        self.stream.write(text)
+
+    def run(self, input_stream=None):
+        """Приветствие, стартовый скрипт и, если скрипта нет, команды из input_stream"""
+        self.start()
+
+        if input_stream is not None and not self.startup_script:
+            for line in input_stream:
+                if not self.running:
+                    break
+                command_text = line.strip()
+                if command_text:
+                    # Как в окне: введенная команда выводится после приглашения
+                    self.output(f"{command_text}\n")
+                    self.process_command(command_text)
+                if self.running:
+                    self.show_prompt()
+
+        self.stream.flush()
+        self.stop_watcher()
+        self.close_log()
+
+def run_headless(args, options):
+    """Запуск эмулятора в пакетном режиме, возвращает код завершения"""
+    if args.output:
+        stream = open(args.output, 'w', encoding='utf-8', buffering=1024 * 1024)
+    else:
+        stream = sys.stdout
+
+    # Служебные сообщения (загрузка VFS, ошибки лога) уходят в stderr,
+    # чтобы не смешиваться с выводом команд
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            shell = HeadlessShell(stream, args.vfs, args.log, args.script, **options)
+            shell.run(sys.stdin)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return 0
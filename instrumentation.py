@@ -0,0 +1,119 @@
+"""
+Профилирование команд эмулятора
+
+Для каждого измеряемого вызова команды записываются время выполнения (wall),
+процессорное время потока (cpu), объем вывода в байтах, число затронутых узлов
+VFS и пик выделенной памяти (tracemalloc). Режимы:
+    off     - ничего не измеряется
+    on      - измеряется каждый вызов
+    sampled - измеряется каждый N-й вызов (tracemalloc заметно замедляет команды)
+"""
+
+import math
+import time
+import tracemalloc
+from collections import deque
+
+
+MODES = ("off", "on", "sampled")
+# Сколько последних измерений хранится для каждой команды
+HISTORY_SIZE = 10000
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу для отсортированного списка"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+class CommandSample:
+    """Измерение одного вызова команды"""
+    __slots__ = ('command', 'wall', 'cpu', 'bytes_out', 'nodes', 'peak',
+                 '_wall_start', '_cpu_start', '_nodes_start', '_memory_start', '_own_tracing')
+
+    def __init__(self, command):
+        self.command = command
+        self.wall = self.cpu = 0.0
+        self.bytes_out = self.nodes = self.peak = 0
+
+    def fields(self):
+        """Поля для XML-лога"""
+        return {
+            'wall_ms': f"{self.wall * 1000:.3f}",
+            'cpu_ms': f"{self.cpu * 1000:.3f}",
+            'bytes_out': str(self.bytes_out),
+            'nodes_touched': str(self.nodes),
+            'alloc_peak': str(self.peak),
+        }
+
+class CommandProfiler:
+    """Сбор измерений команд за сеанс и статистика задержек"""
+    def __init__(self, mode="off", every=10):
+        if mode not in MODES:
+            raise ValueError(f"неизвестный режим профилирования '{mode}'")
+        self.mode = mode
+        self.every = max(every, 1)
+        self._calls = 0
+        self._history = {}
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def begin(self, command, vfs):
+        """Начало измерения; None, если этот вызов не измеряется"""
+        if self.mode == "off":
+            return None
+        self._calls += 1
+        if self.mode == "sampled" and self._calls % self.every:
+            return None
+
+        sample = CommandSample(command)
+        sample._own_tracing = not tracemalloc.is_tracing()
+        if sample._own_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        sample._memory_start = tracemalloc.get_traced_memory()[0]
+        sample._nodes_start = vfs.nodes_touched
+        sample._cpu_start = time.thread_time()
+        sample._wall_start = time.perf_counter()
+        return sample
+
+    def end(self, sample, vfs):
+        """Завершение измерения и сохранение его в истории команды"""
+        sample.wall = time.perf_counter() - sample._wall_start
+        sample.cpu = time.thread_time() - sample._cpu_start
+        sample.nodes = vfs.nodes_touched - sample._nodes_start
+        sample.peak = max(tracemalloc.get_traced_memory()[1] - sample._memory_start, 0)
+        if sample._own_tracing:
+            tracemalloc.stop()
+
+        history = self._history.get(sample.command)
+        if history is None:
+            history = self._history[sample.command] = deque(maxlen=HISTORY_SIZE)
+        history.append(sample)
+
+    @staticmethod
+    def count_output(sample, stream):
+        """Поток порций вывода с подсчетом байт для измерения"""
+        for chunk in stream:
+            sample.bytes_out += len(chunk.encode('utf-8'))
+            yield chunk
+
+    def summary(self):
+        """Строки таблицы: команда, вызовов, p50/p95/p99 времени (мс), среднее cpu, вывод и пик памяти"""
+        rows = []
+        for command in sorted(self._history):
+            samples = self._history[command]
+            walls = sorted(sample.wall * 1000 for sample in samples)
+            count = len(samples)
+            rows.append((
+                command, count,
+                percentile(walls, 0.50), percentile(walls, 0.95), percentile(walls, 0.99),
+                sum(sample.cpu for sample in samples) * 1000 / count,
+                sum(sample.bytes_out for sample in samples) // count,
+                max(sample.peak for sample in samples),
+            ))
+        return rows
@@ -0,0 +1,52 @@
+"""
+Перевод лога эмулятора (jsonl, binary, в том числе сжатых gzip сегментов)
+в XML-схему emulator_log
+"""
+
+import argparse
+import os
+import sys
+
+from emulator_log import XMLLogWriter, read_log
+
+
+def convert(inputs, output):
+    """Запись событий всех входных файлов по порядку в один XML-лог; возвращает число событий"""
+    writer = XMLLogWriter(output, flush_events=4096)
+    count = 0
+    try:
+        for path in inputs:
+            for timestamp, command, message, error, current_dir, extra in read_log(path):
+                writer.write_event(command, message, error, current_dir, timestamp, extra)
+                count += 1
+    finally:
+        writer.close()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Перевод лога эмулятора в XML')
+    parser.add_argument('inputs', nargs='+',
+                        help='Файлы лога (сегменты ротации - от старых к новым)')
+    parser.add_argument('-o', '--output',
+                        help='XML-файл результата (по умолчанию - имя первого файла с .xml)')
+    args = parser.parse_args()
+
+    output = args.output
+    if output is None:
+        name = args.inputs[0]
+        if name.endswith('.gz'):
+            name = name[:-3]
+        output = os.path.splitext(name)[0] + '.xml'
+    if any(os.path.abspath(output) == os.path.abspath(path) for path in args.inputs):
+        parser.error(f"файл результата '{output}' совпадает со входным")
+
+    try:
+        count = convert(args.inputs, output)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    print(f"Событий: {count}, записано в {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Компиляция стартовых скриптов
+
+Скрипт компилируется в кортежи (номер строки, текст, токены) перед выполнением,
+и команды получают уже разобранные токены.
+"""
+
+import os
+
+
+# Скрипты больше этого размера не загружаются целиком и выполняются построчно из файла
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+
+def compile_line(line_num, line):
+    """Компиляция одной строки скрипта; None для пустых строк и комментариев"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    return (line_num, line, line.split())
+
+def compile_text(text):
+    """Компиляция текста скрипта целиком"""
+    # Переводы строк нормализуются так же, как при чтении файла в текстовом режиме
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    compiled = []
+    for line_num, line in enumerate(text.split('\n'), 1):
+        entry = compile_line(line_num, line)
+        if entry is not None:
+            compiled.append(entry)
+    return compiled
+
+def stream_script(path):
+    """Построчная компиляция большого скрипта без загрузки файла целиком"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            entry = compile_line(line_num, line)
+            if entry is not None:
+                yield entry
+
+def compile_script(path, stream_threshold=STREAM_THRESHOLD):
+    """Скомпилированный скрипт: (строки, число строк в файле); скрипт больше
+    stream_threshold разбирается по мере выполнения, и число строк - None"""
+    if os.path.getsize(path) > stream_threshold:
+        return stream_script(path), None
+    with open(path, 'rb') as f:
+        text = f.read().decode('utf-8')
+    line_count = text.count('\n') + (0 if text.endswith('\n') or not text else 1)
+    return compile_text(text), line_count
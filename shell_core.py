@@ -0,0 +1,897 @@
+"""
+Ядро эмулятора командной оболочки, не зависящее от интерфейса
+"""
+
+import inspect
+import os
+import re
+import threading
+
+from vfs import VirtualFileSystem, count_text, iter_lines, line_matcher
+from vfs_snapshot import load_snapshot, save_snapshot, SnapshotError
+from emulator_log import LOG_FORMATS, AsyncLogSink
+from commands import COMMANDS, command
+from scripts import compile_script
+from instrumentation import CommandProfiler
+
+
+class CommandInterrupted(Exception):
+    """Выполнение прервано пользователем (Ctrl+C)"""
+
+
+class ResyncWatcher(threading.Thread):
+    """Фоновая проверка физической директории VFS.
+    Поток только обнаруживает изменения; синхронизация выполняется перед
+    следующей командой в потоке команд, чтобы дерево менял один поток"""
+    def __init__(self, shell, interval):
+        super().__init__(name="vfs-watcher", daemon=True)
+        self.shell = shell
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                stale = self.shell.vfs.stale()
+            except RuntimeError:
+                # Дерево менялось во время проверки - повторим на следующем интервале
+                continue
+            if stale:
+                self.shell.resync_requested.set()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class ShellCore:
+    """Ядро эмулятора: VFS, лог и команды без привязки к интерфейсу"""
+    def __init__(self, vfs_path=None, log_file=None, startup_script=None, lazy_vfs=False,
+                 vfs_snapshot=None, vfs_workers=None, vfs_watch=None, vfs_index=False,
+                 profile="off", profile_every=10, log_queue=10000, log_policy="block",
+                 log_rotation=None, log_format="xml"):
+        self.username = os.getenv('USERNAME') or os.getenv('USER')
+        self.hostname = os.uname().nodename if hasattr(os, 'uname') else os.getenv('COMPUTERNAME', 'localhost')
+        self.running = True
+        self.commands = COMMANDS
+        # Флаг отмены выполняемой команды или скрипта (Ctrl+C)
+        self.cancel_event = threading.Event()
+        # Измерение времени, памяти и объема вывода команд (команда stats)
+        self.profiler = CommandProfiler(profile, profile_every)
+        
+        # Параметры конфигурации
+        self.vfs_path = vfs_path
+        self.log_file = log_file
+        self.log_queue = log_queue
+        self.log_policy = log_policy
+        self.log_format = log_format
+        # Параметры ротации лога (max_bytes, max_age, backups, compress для LogWriter)
+        self.log_rotation = log_rotation or {}
+        self.startup_script = startup_script
+        
+        # Инициализация VFS
+        self.vfs = self.create_vfs(vfs_path, lazy_vfs, vfs_snapshot, vfs_workers)
+        
+        # Индекс имен и содержимого для find и grep
+        if vfs_index:
+            self.vfs.enable_index()
+        
+        # Фоновое отслеживание изменений физической директории VFS
+        self.resync_requested = threading.Event()
+        self.watcher = None
+        if vfs_watch and self.vfs.physical_path:
+            self.watcher = ResyncWatcher(self, vfs_watch)
+            self.watcher.start()
+        
+        # Настройка логирования
+        self.setup_logging()
+        
+        # Логирование параметров запуска
+        self.log_event("startup", f"Эмулятор запущен с параметрами: VFS={vfs_path}, LOG={log_file}, SCRIPT={startup_script}")
+        
+    def create_vfs(self, vfs_path, lazy_vfs, vfs_snapshot, vfs_workers=None):
+        """Создание VFS: из снимка, если он построен из vfs_path и не устарел,
+        иначе из физической директории"""
+        if vfs_snapshot and os.path.exists(vfs_snapshot):
+            try:
+                vfs = load_snapshot(vfs_snapshot)
+            except (OSError, ValueError, SnapshotError) as e:
+                print(f"Ошибка загрузки снимка VFS: {e}")
+            else:
+                source = os.path.abspath(vfs_path) if vfs_path else None
+                if vfs.physical_path != source:
+                    print(f"Снимок VFS {vfs_snapshot} построен из другой директории "
+                          f"({vfs.physical_path or 'не указана'}), VFS загружается заново")
+                elif vfs.stale():
+                    print(f"Снимок VFS {vfs_snapshot} устарел, VFS загружается заново")
+                else:
+                    print(f"VFS загружена из снимка: {vfs_snapshot}")
+                    return vfs
+        
+        vfs = VirtualFileSystem(vfs_path, lazy=lazy_vfs, load_workers=vfs_workers)
+        
+        # Снимка нет или он не подходит - сохраняем построенное дерево для следующих запусков
+        if vfs_snapshot:
+            try:
+                node_count = save_snapshot(vfs, vfs_snapshot)
+                print(f"Снимок VFS сохранен: {vfs_snapshot} (узлов: {node_count})")
+            except OSError as e:
+                print(f"Ошибка сохранения снимка VFS: {e}")
+        return vfs
+        
+    def output(self, text):
+        """Вывод текста пользователю (реализуется интерфейсом)"""
+        raise NotImplementedError
+        
+    def quit(self):
+        """Завершение работы эмулятора (реализуется интерфейсом)"""
+        self.running = False
+        
+    def report_progress(self, task, done, total, unit="строка"):
+        """Сообщение о ходе длительной операции (реализуется интерфейсом)"""
+        
+    def tree_progress(self, task):
+        """Обратный вызов для рекурсивных операций VFS: отмена по Ctrl+C и ход выполнения"""
+        def progress(done):
+            self.check_cancelled()
+            self.report_progress(task, done, None, unit="узлов")
+        return progress
+        
+    def check_cancelled(self):
+        """Прерывание выполнения, если пользователь нажал Ctrl+C"""
+        if self.cancel_event.is_set():
+            raise CommandInterrupted()
+        
+    def start(self):
+        """Приветствие и запуск стартового скрипта"""
+        # Приветственное сообщение
+        self.output(f"Добро пожаловать в эмулятор командной оболочки!\n")
+        self.output(f"Текущий пользователь: {self.username}@{self.hostname}\n")
+        
+        # Вывод MOTD если есть
+        motd = self.vfs.get_motd()
+        if motd:
+            self.output(f"\n=== MOTD ===\n{motd}\n============\n\n")
+        
+        # Вывод параметров конфигурации
+        self.output(f"Параметры запуска:\n")
+        self.output(f"  VFS путь: {self.vfs_path or 'Не указан'}\n")
+        self.output(f"  Лог-файл: {self.log_file or 'Не указан'}\n")
+        self.output(f"  Стартовый скрипт: {self.startup_script or 'Не указан'}\n")
+        
+        self.output("Введите 'exit' для выхода или 'help' для списка команд\n\n")
+        
+        # Выполнение стартового скрипта если указан
+        if self.startup_script and os.path.exists(self.startup_script):
+            self.execute_startup_script(self.startup_script)
+        else:
+            self.show_prompt()
+        
+    def setup_logging(self):
+        """Настройка логирования в формате log_format (xml, jsonl или binary)"""
+        self.log_writer = None
+        if self.log_file:
+            try:
+                self.log_writer = LOG_FORMATS[self.log_format](self.log_file, **self.log_rotation)
+            except OSError as e:
+                print(f"Ошибка открытия лога: {e}")
+                return
+            # Файл пишет фоновый поток, команды только ставят события в очередь
+            if self.log_queue:
+                self.log_writer = AsyncLogSink(self.log_writer, self.log_queue, self.log_policy)
+            
+    def log_event(self, command, message, error=None, extra=None):
+        """Логирование события"""
+        if self.log_writer:
+            try:
+                self.log_writer.write_event(command, message, error, self.vfs.get_current_path(),
+                                            extra=extra)
+            except Exception as e:
+                print(f"Ошибка записи лога: {e}")
+
+    def flush_log(self, wait=False):
+        """Сброс накопленных событий лога на диск (wait - дождаться окончания записи)"""
+        if self.log_writer:
+            try:
+                if wait:
+                    self.log_writer.sync()
+                else:
+                    self.log_writer.flush()
+            except Exception as e:
+                print(f"Ошибка записи лога: {e}")
+
+    def stop_watcher(self):
+        """Остановка фоновой проверки физической директории VFS"""
+        if self.watcher is not None:
+            self.watcher.stop()
+        
+    def close_log(self):
+        """Закрытие лога с записью закрывающего тега"""
+        if self.log_writer:
+            try:
+                self.log_writer.close()
+            except Exception as e:
+                print(f"Ошибка записи лога: {e}")
+        
+    def execute_startup_script(self, script_path):
+        """Выполнение стартового скрипта"""
+        self.output(f"\n=== Выполнение стартового скрипта: {script_path} ===\n")
+        
+        line_num = 0
+        try:
+            # Слишком большой скрипт читается и разбирается построчно
+            lines, total = compile_script(script_path)
+            
+            for line_num, line, tokens in lines:
+                if not self.running:
+                    break
+                self.check_cancelled()
+                self.report_progress(script_path, line_num, total)
+                self.output(f"[{line_num}] {line}\n")
+                self.process_command(line, tokens)
+                    
+        except CommandInterrupted:
+            self.output("^C\n")
+            self.log_event("script_interrupted", f"Скрипт прерван на строке {line_num}")
+        except Exception as e:
+            error_msg = f"Ошибка выполнения скрипта: {e}"
+            self.output(f"{error_msg}\n")
+            self.log_event("script_error", f"Ошибка в строке {line_num}", error=error_msg)
+        
+        self.report_progress(script_path, None, None)
+        self.output("=== Завершение выполнения скрипта ===\n\n")
+        self.flush_log()
+        self.show_prompt()
+        
+    def sync_vfs(self, check_files=False, auto=False):
+        """Синхронизация VFS с физической директорией и сообщение об изменениях"""
+        counts = self.vfs.resync(check_files)
+        changed = counts['added'] + counts['updated'] + counts['removed']
+        message = (f"Синхронизация VFS: добавлено {counts['added']}, изменено {counts['updated']}, "
+                   f"удалено {counts['removed']} (проверено директорий: {counts['dirs']})")
+        # Автоматическая синхронизация без изменений ничего не выводит
+        if changed or not auto:
+            self.output(f"{message}\n")
+            self.log_event("resync", message)
+        
+    def prompt_text(self):
+        """Текст приглашения командной строки"""
+        return f"{self.username}@{self.hostname}:{self.vfs.get_current_path().replace('/home/user', '~')}$ "
+        
+    def show_prompt(self):
+        self.output(self.prompt_text())
+        
+    def process_command(self, command_text, tokens=None):
+        """Обработка команды (tokens - уже разобранная строка, например из скрипта)"""
+        if not command_text:
+            return
+            
+        parts = tokens if tokens is not None else command_text.split()
+        command = parts[0]
+        args = parts[1:] if len(parts) > 1 else []
+        
+        # Изменения на диске, найденные фоновой проверкой, применяются перед командой
+        if self.resync_requested.is_set():
+            self.resync_requested.clear()
+            self.sync_vfs(auto=True)
+        
+        # Логирование вызова команды
+        self.log_event(command, f"Выполнение команды: {command_text}")
+        
+        # Разбор конвейера и перенаправления
+        try:
+            stages, redirect = self.parse_pipeline(parts)
+        except ValueError as e:
+            error_msg = f"Ошибка: {e}"
+            self.output(f"{error_msg}\n")
+            self.log_event(command, f"Синтаксическая ошибка: {command_text}", error=error_msg)
+            return
+        
+        # Поиск обработчиков в реестре команд
+        commands = []
+        for name, stage_args in stages:
+            cmd = self.commands.get(name)
+            if cmd is None:
+                error_msg = f"Ошибка: неизвестная команда '{name}'"
+                self.output(f"{error_msg}\n")
+                self.log_event(name, f"Неизвестная команда: {name}", error=error_msg)
+                return
+            commands.append((cmd, stage_args))
+        
+        # Команды конвейера - генераторы: порции проходят через все стадии по одной,
+        # поэтому память не растет с объемом вывода
+        streams = []
+        stream = None
+        sample = self.profiler.begin(command, self.vfs)
+        try:
+            for cmd, stage_args in commands:
+                stream = cmd.run(self, stage_args, stream)
+                streams.append(stream)
+            if sample is not None:
+                stream = self.profiler.count_output(sample, stream)
+            
+            if redirect is None:
+                for chunk in stream:
+                    self.check_cancelled()
+                    self.output(chunk)
+            else:
+                mode, path = redirect
+                success, message = self.vfs.write_file(path, self.cancellable(stream),
+                                                       append=(mode == ">>"))
+                if not success:
+                    self.output(f"{command}: {message}\n")
+                    self.log_event(command, f"Ошибка перенаправления: {path}", error=message)
+            self.finish_pipeline(streams)
+        except CommandInterrupted:
+            self.finish_pipeline(streams, drain=False)
+            self.output("^C\n")
+            self.log_event(command, f"Команда прервана: {command_text}")
+        finally:
+            if sample is not None:
+                self.profiler.end(sample, self.vfs)
+                self.log_event(command, f"Профиль команды: {command_text}", extra=sample.fields())
+        
+    @staticmethod
+    def parse_pipeline(parts):
+        """Разделение токенов на стадии конвейера [(команда, аргументы)] и
+        перенаправление (">" или ">>", путь) либо None"""
+        redirect = None
+        for operator in (">>", ">"):
+            if operator in parts:
+                position = parts.index(operator)
+                if len(parts) != position + 2:
+                    raise ValueError(f"после '{operator}' должен следовать один путь")
+                redirect = (operator, parts[position + 1])
+                parts = parts[:position]
+                break
+        
+        stages = []
+        current = []
+        for token in parts:
+            if token == "|":
+                stages.append(current)
+                current = []
+            else:
+                current.append(token)
+        stages.append(current)
+        
+        if any(not stage for stage in stages):
+            raise ValueError("пустая команда в конвейере")
+        return [(stage[0], stage[1:]) for stage in stages], redirect
+        
+    def cancellable(self, stream):
+        """Поток порций с проверкой Ctrl+C перед каждой"""
+        for chunk in stream:
+            self.check_cancelled()
+            yield chunk
+        
+    @staticmethod
+    def finish_pipeline(streams, drain=True):
+        """Завершение стадий конвейера после того, как последняя закончила работу
+        (drain=False - после прерывания: стадии только останавливаются)"""
+        for stream in streams:
+            if not inspect.isgenerator(stream):
+                continue
+            if drain and inspect.getgeneratorstate(stream) == inspect.GEN_CREATED:
+                # Стадия, чей вывод никто не читал (cp ... | echo), все равно выполняется
+                for _ in stream:
+                    pass
+            else:
+                # Как SIGPIPE: недочитанный источник (cat большой_файл | ...) останавливается
+                stream.close()
+        
+    @command("ls", "ls [-al] [--offset N] [--limit N] [путь]",
+             "список файлов (постранично с --offset/--limit)", options="al")
+    def cmd_ls(self, args):
+        """Команда ls - список файлов VFS с поддержкой опций"""
+        # Параметры страницы со значениями отделяются до разбора коротких опций
+        page = {'offset': 0, 'limit': None}
+        rest = []
+        i = 0
+        try:
+            while i < len(args):
+                name, sep, value = args[i].partition('=')
+                if name in ('--offset', '--limit'):
+                    if not sep:
+                        if i + 1 >= len(args):
+                            raise ValueError(f"не указано значение для {name}")
+                        i += 1
+                        value = args[i]
+                    if not value.isdigit():
+                        raise ValueError(f"неверное значение {name} '{value}'")
+                    page[name[2:]] = int(value)
+                else:
+                    rest.append(args[i])
+                i += 1
+        except ValueError as e:
+            error_msg = f"Ошибка: {e}"
+            self.output(f"ls: {error_msg}\n")
+            self.log_event("ls", "Неверные аргументы", error=error_msg)
+            return
+        
+        flags, operands = self.commands.get("ls").parse(rest)
+        show_hidden = 'a' in flags
+        long_format = 'l' in flags
+        path = operands[-1] if operands else None
+        
+        items = self.vfs.iter_directory(path, show_hidden, long_format,
+                                        page['offset'], page['limit'])
+        
+        if items is None:
+            error_msg = f"Ошибка: директория '{path}' не найдена"
+            self.output(f"{error_msg}\n")
+            self.log_event("ls", f"Директория не найдена: {path}", error=error_msg)
+            return
+        
+        # Строки выдаются по одной: ls | head останавливает обход после нужного числа
+        empty = True
+        for item in items:
+            empty = False
+            yield f"{item}\n"
+        if empty and not page['offset']:
+            yield "Директория пуста\n"
+        
+    @command("cd", "cd [путь]", "смена директории")
+    def cmd_cd(self, args):
+        """Команда cd - смена директории VFS"""
+        if len(args) == 0:
+            path = "~"  # Домашняя директория
+        elif len(args) == 1:
+            path = args[0]
+        else:
+            error_msg = "Ошибка: неверное количество аргументов для cd"
+            self.output(f"{error_msg}\n")
+            self.log_event("cd", f"Неверные аргументы: {args}", error=error_msg)
+            return
+        
+        if self.vfs.change_directory(path):
+            yield f"Переход в директорию: {self.vfs.get_current_path()}\n"
+        else:
+            error_msg = f"Ошибка: директория '{path}' не найдена"
+            self.output(f"{error_msg}\n")
+            self.log_event("cd", f"Директория не найдена: {path}", error=error_msg)
+            
+    @command("cat", "cat [файл...]", "вывод содержимого файлов")
+    def cmd_cat(self, args, stdin=None):
+        """Команда cat - вывод содержимого файла (без файлов - вывода предыдущей команды)"""
+        if not args and stdin is not None:
+            yield from stdin
+            return
+        if not args:
+            error_msg = "Ошибка: не указан файл"
+            self.output(f"{error_msg}\n")
+            self.log_event("cat", "Не указан файл", error=error_msg)
+            return
+            
+        for filename in args:
+            self.check_cancelled()
+            node = self.vfs.resolve(filename)
+            
+            if node is not None and not node.is_directory:
+                # Содержимое выдается порциями, большие файлы не копируются целиком
+                yield from node.iter_chunks()
+                yield "\n"
+            else:
+                error_msg = f"Ошибка: файл '{filename}' не найден"
+                self.output(f"{error_msg}\n")
+                self.log_event("cat", f"Файл не найден: {filename}", error=error_msg)
+    
+    @command("head", "head [-n N] [файл...]", "первые строки файлов или вывода (по умолчанию 10)")
+    def cmd_head(self, args, stdin=None):
+        """Команда head - первые N строк; предыдущая команда конвейера останавливается после них"""
+        count = 10
+        filenames = []
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg == "-n" and i + 1 < len(args):
+                arg = "-" + args[i + 1]
+                i += 1
+            if arg.startswith('-'):
+                if not arg[1:].isdigit():
+                    error_msg = f"Ошибка: неверное число строк '{arg[1:]}'"
+                    self.output(f"head: {error_msg}\n")
+                    self.log_event("head", "Неверные аргументы", error=error_msg)
+                    return
+                count = int(arg[1:])
+            else:
+                filenames.append(arg)
+            i += 1
+        
+        if not filenames:
+            if stdin is None:
+                error_msg = "Ошибка: не указан файл"
+                self.output(f"{error_msg}\n")
+                self.log_event("head", "Не указан файл", error=error_msg)
+                return
+            sources = [("", stdin)]
+        else:
+            sources = []
+            for filename in filenames:
+                node = self.vfs.resolve(filename)
+                if node is None or node.is_directory:
+                    error_msg = f"Ошибка: файл '{filename}' не найден"
+                    self.output(f"{error_msg}\n")
+                    self.log_event("head", f"Файл не найден: {filename}", error=error_msg)
+                    continue
+                sources.append((filename, node.iter_chunks()))
+        
+        for filename, chunks in sources:
+            self.check_cancelled()
+            if len(filenames) > 1:
+                yield f"==> {filename} <==\n"
+            if count == 0:
+                continue
+            for line_num, line in enumerate(iter_lines(chunks), 1):
+                yield f"{line}\n"
+                if line_num >= count:
+                    break
+    
+    @command("uname", "uname [-asn]", "информация о системе", options="asn")
+    def cmd_uname(self, args):
+        """Команда uname - информация о системе"""
+        show_all = False
+        show_kernel = False
+        show_hostname = False
+        
+        # Парсинг аргументов
+        for arg in args:
+            if arg == "-a":
+                show_all = True
+            elif arg == "-s":
+                show_kernel = True
+            elif arg == "-n":
+                show_hostname = True
+        
+        # Если нет аргументов или показать все
+        if not args or show_all:
+            yield f"EmulatorOS 1.0 {self.hostname} 2024-01-01\n"
+        elif show_kernel:
+            yield "EmulatorOS\n"
+        elif show_hostname:
+            yield f"{self.hostname}\n"
+        else:
+            yield "EmulatorOS\n"
+    
+    @command("wc", "wc [-lwmc] [файл...]", "подсчет строк, слов, символов", options="lwmc")
+    def cmd_wc(self, args, stdin=None):
+        """Команда wc - подсчет строк, слов, символов (без файлов - в выводе предыдущей команды)"""
+        count_lines = True
+        count_words = True
+        count_chars = True
+        count_bytes = False
+        filenames = []
+        
+        # Парсинг аргументов
+        for arg in args:
+            if arg.startswith('-'):
+                if 'l' in arg:
+                    count_lines = True
+                    count_words = False
+                    count_chars = False
+                    count_bytes = False
+                if 'w' in arg:
+                    count_lines = False
+                    count_words = True
+                    count_chars = False
+                    count_bytes = False
+                if 'm' in arg:
+                    count_lines = False
+                    count_words = False
+                    count_chars = True
+                    count_bytes = False
+                if 'c' in arg:
+                    count_lines = False
+                    count_words = False
+                    count_chars = False
+                    count_bytes = True
+            else:
+                filenames.append(arg)
+        
+        # Без файлов считается вывод предыдущей команды конвейера, порция за порцией
+        if not filenames and stdin is not None:
+            stats = count_text(stdin, count_bytes)
+            selected = [(count_lines, 'lines'), (count_words, 'words'),
+                        (count_chars, 'chars'), (count_bytes, 'bytes')]
+            yield " ".join(str(stats[key]) for enabled, key in selected if enabled) + "\n"
+            return
+        
+        if not filenames:
+            self.output("Ошибка: wc требует указания файлов\n")
+            return
+        
+        total_lines = 0
+        total_words = 0
+        total_chars = 0
+        total_bytes = 0
+        
+        for filename in filenames:
+            self.check_cancelled()
+            stats = self.vfs.get_file_stats(filename)
+            if stats:
+                # Вывод статистики для файла
+                output_parts = []
+                if count_lines:
+                    output_parts.append(str(stats['lines']))
+                if count_words:
+                    output_parts.append(str(stats['words']))
+                if count_chars:
+                    output_parts.append(str(stats['chars']))
+                if count_bytes:
+                    output_parts.append(str(stats['bytes']))
+                
+                output_parts.append(filename)
+                yield " ".join(output_parts) + "\n"
+                
+                # Суммируем для общего итога
+                total_lines += stats['lines']
+                total_words += stats['words']
+                total_chars += stats['chars']
+                total_bytes += stats['bytes']
+            else:
+                error_msg = f"Ошибка: файл '{filename}' не найден"
+                self.output(f"{error_msg}\n")
+                self.log_event("wc", f"Файл не найден: {filename}", error=error_msg)
+        
+        # Вывод общего итога если несколько файлов
+        if len(filenames) > 1:
+            output_parts = []
+            if count_lines:
+                output_parts.append(str(total_lines))
+            if count_words:
+                output_parts.append(str(total_words))
+            if count_chars:
+                output_parts.append(str(total_chars))
+            if count_bytes:
+                output_parts.append(str(total_bytes))
+            
+            output_parts.append("total")
+            yield " ".join(output_parts) + "\n"
+    
+    @command("rmdir", "rmdir [директория]", "удаление пустых директорий")
+    def cmd_rmdir(self, args):
+        """Команда rmdir - удаление пустых директорий"""
+        if not args:
+            error_msg = "Ошибка: не указана директория для удаления"
+            self.output(f"{error_msg}\n")
+            self.log_event("rmdir", "Не указана директория", error=error_msg)
+            return
+        
+        for dirname in args:
+            success, message = self.vfs.remove_directory(dirname)
+            if success:
+                yield f"{message}\n"
+            else:
+                self.output(f"rmdir: {message}\n")
+                self.log_event("rmdir", f"Ошибка удаления: {dirname}", error=message)
+    
+    @command("cp", "cp [-r] исх. цель", "копирование файлов и директорий", options="rR")
+    def cmd_cp(self, args):
+        """Команда cp - копирование файлов (с -r - директорий целиком)"""
+        flags, operands = self.commands.get("cp").parse(args)
+        if len(operands) < 2:
+            error_msg = "Ошибка: недостаточно аргументов. Использование: cp [-r] исходный_файл целевой_файл"
+            self.output(f"{error_msg}\n")
+            self.log_event("cp", "Недостаточно аргументов", error=error_msg)
+            return
+        
+        source_name = operands[0]
+        target_name = operands[1]
+        
+        if flags:
+            try:
+                success, message = self.vfs.copy_tree(source_name, target_name,
+                                                      self.tree_progress(f"cp {source_name}"))
+            finally:
+                self.report_progress(f"cp {source_name}", None, None)
+        else:
+            success, message = self.vfs.copy_file(source_name, target_name)
+        if success:
+            yield f"{message}\n"
+            if flags:
+                # Одно итоговое событие на всю операцию, а не на каждый узел
+                self.log_event("cp", message)
+        else:
+            self.output(f"cp: {message}\n")
+            self.log_event("cp", f"Ошибка копирования: {source_name} -> {target_name}", error=message)
+    
+    @command("rm", "rm [-rf] путь...", "удаление файлов и директорий", options="rRf")
+    def cmd_rm(self, args):
+        """Команда rm - удаление файлов (с -r - директорий со всем содержимым)"""
+        flags, operands = self.commands.get("rm").parse(args)
+        recursive = 'r' in flags or 'R' in flags
+        if not operands:
+            error_msg = "Ошибка: не указан путь для удаления"
+            self.output(f"{error_msg}\n")
+            self.log_event("rm", "Не указан путь", error=error_msg)
+            return
+        
+        for path in operands:
+            try:
+                success, message = self.vfs.remove_tree(path, recursive, self.tree_progress(f"rm {path}"))
+            finally:
+                self.report_progress(f"rm {path}", None, None)
+            if success:
+                yield f"{message}\n"
+                self.log_event("rm", message)
+            elif 'f' not in flags or self.vfs.resolve(path) is not None:
+                # -f скрывает только ошибки отсутствующих путей
+                self.output(f"rm: {message}\n")
+                self.log_event("rm", f"Ошибка удаления: {path}", error=message)
+    
+    @command("mv", "mv исх. цель", "перемещение и переименование")
+    def cmd_mv(self, args):
+        """Команда mv - перемещение или переименование файлов и директорий"""
+        if len(args) < 2:
+            error_msg = "Ошибка: недостаточно аргументов. Использование: mv исходный_путь целевой_путь"
+            self.output(f"{error_msg}\n")
+            self.log_event("mv", "Недостаточно аргументов", error=error_msg)
+            return
+        
+        success, message = self.vfs.move_node(args[0], args[1])
+        if success:
+            yield f"{message}\n"
+            self.log_event("mv", message)
+        else:
+            self.output(f"mv: {message}\n")
+            self.log_event("mv", f"Ошибка перемещения: {args[0]} -> {args[1]}", error=message)
+            
+    @command("find", "find [путь] [опции]", "поиск файлов: -name шаблон, -type f|d, -size [+-]N[kM]")
+    def cmd_find(self, args):
+        """Команда find - поиск по шаблону имени, типу и размеру"""
+        path = None
+        tests = {}
+        i = 0
+        try:
+            while i < len(args):
+                arg = args[i]
+                if arg in ("-name", "-type", "-size"):
+                    if i + 1 >= len(args):
+                        raise ValueError(f"не указано значение для {arg}")
+                    tests[arg[1:]] = args[i + 1]
+                    i += 2
+                    continue
+                if arg.startswith('-') or path is not None:
+                    raise ValueError(f"неизвестный аргумент '{arg}'")
+                path = arg
+                i += 1
+            
+            kind = tests.get('type')
+            if kind not in (None, 'f', 'd'):
+                raise ValueError(f"неизвестный тип '{kind}' (допустимо f или d)")
+            size = self.parse_size(tests['size']) if 'size' in tests else None
+        except ValueError as e:
+            error_msg = f"Ошибка: {e}"
+            self.output(f"find: {error_msg}\n")
+            self.log_event("find", "Неверные аргументы", error=error_msg)
+            return
+        
+        paths = self.vfs.find(path, tests.get('name'), kind, size)
+        if paths is None:
+            error_msg = f"Ошибка: путь '{path}' не найден"
+            self.output(f"find: {error_msg}\n")
+            self.log_event("find", f"Путь не найден: {path}", error=error_msg)
+            return
+        
+        for found in paths:
+            yield f"{found}\n"
+        
+    @staticmethod
+    def parse_size(text):
+        """Размер для find -size: '+10k' -> ('+', 10240); без суффикса - байты"""
+        sign = '='
+        if text[:1] in ('+', '-'):
+            sign, text = text[0], text[1:]
+        multiplier = {'c': 1, 'k': 1024, 'M': 1024 * 1024}.get(text[-1:], None)
+        if multiplier is not None:
+            text = text[:-1]
+        if not text.isdigit():
+            raise ValueError(f"неверный размер '{text}'")
+        return sign, int(text) * (multiplier or 1)
+        
+    @command("grep", "grep [-inlE] шаблон [путь...]", "поиск строк в файлах", options="inlE")
+    def cmd_grep(self, args, stdin=None):
+        """Команда grep - поиск строк по подстроке или регулярному выражению (-E)
+        в файлах или, если пути не указаны, в выводе предыдущей команды"""
+        flags, operands = self.commands.get("grep").parse(args)
+        if not operands:
+            error_msg = "Ошибка: не указан шаблон. Использование: grep [-inlE] шаблон [путь...]"
+            self.output(f"{error_msg}\n")
+            self.log_event("grep", "Не указан шаблон", error=error_msg)
+            return
+        
+        pattern = operands[0]
+        if len(operands) == 1 and stdin is not None:
+            try:
+                match, _ = line_matcher(pattern, 'E' in flags, 'i' in flags)
+            except re.error as e:
+                error_msg = f"Ошибка: неверное регулярное выражение: {e}"
+                self.output(f"grep: {error_msg}\n")
+                self.log_event("grep", f"Неверный шаблон: {pattern}", error=error_msg)
+                return
+            for line_num, line in enumerate(iter_lines(stdin), 1):
+                if match(line):
+                    yield f"{line_num}:{line}\n" if 'n' in flags else f"{line}\n"
+            return
+        
+        paths = operands[1:] or [None]
+        # Имя файла выводится, если поиск идет больше чем в одном файле
+        single_file = len(paths) == 1 and paths[0] is not None and \
+            not getattr(self.vfs.resolve(paths[0]), 'is_directory', True)
+        
+        for path in paths:
+            try:
+                matches = self.vfs.grep(pattern, path, 'E' in flags, 'i' in flags)
+            except re.error as e:
+                error_msg = f"Ошибка: неверное регулярное выражение: {e}"
+                self.output(f"grep: {error_msg}\n")
+                self.log_event("grep", f"Неверный шаблон: {pattern}", error=error_msg)
+                return
+            if matches is None:
+                error_msg = f"Ошибка: путь '{path}' не найден"
+                self.output(f"grep: {error_msg}\n")
+                self.log_event("grep", f"Путь не найден: {path}", error=error_msg)
+                continue
+            
+            last_file = None
+            for file_path, line_num, line in matches:
+                if 'l' in flags:
+                    if file_path != last_file:
+                        yield f"{file_path}\n"
+                        last_file = file_path
+                    continue
+                prefix = "" if single_file else f"{file_path}:"
+                if 'n' in flags:
+                    prefix += f"{line_num}:"
+                yield f"{prefix}{line}\n"
+        
+    @command("resync", "resync [-a]", "синхронизация VFS с диском", options="a")
+    def cmd_resync(self, args):
+        """Команда resync - перечитать изменившиеся на диске части VFS"""
+        if not self.vfs.physical_path:
+            error_msg = "Ошибка: VFS не загружена из физической директории"
+            self.output(f"{error_msg}\n")
+            self.log_event("resync", "Нет физической директории", error=error_msg)
+            return
+        
+        # -a: проверять и файлы в неизменившихся директориях (запись в файл на месте)
+        flags, _ = self.commands.get("resync").parse(args)
+        self.sync_vfs(check_files='a' in flags)
+        
+    @command("stats", "stats", "задержки команд за сеанс (p50/p95/p99)")
+    def cmd_stats(self, args):
+        """Команда stats - статистика профилирования команд"""
+        if not self.profiler.enabled:
+            yield "Профилирование выключено (запуск с --profile on или --profile sampled)\n"
+            return
+        
+        rows = self.profiler.summary()
+        if not rows:
+            yield "Нет измерений\n"
+            return
+        
+        yield (f"{'команда':<10} {'вызовов':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} "
+               f"{'cpu, мс':>9} {'вывод, Б':>9} {'пик, Б':>10}\n")
+        for name, count, p50, p95, p99, cpu, bytes_out, peak in rows:
+            yield (f"{name:<10} {count:>8} {p50:>9.3f} {p95:>9.3f} {p99:>9.3f} "
+                   f"{cpu:>9.3f} {bytes_out:>9} {peak:>10}\n")
+        
+    @command("echo", "echo [текст]", "вывод текста")
+    def cmd_echo(self, args):
+        """Команда echo - вывод аргументов"""
+        yield " ".join(args) + "\n"
+        
+    @command("pwd", "pwd", "показать текущую директорию")
+    def cmd_pwd(self, args):
+        """Команда pwd - показать текущую директорию"""
+        yield f"{self.vfs.get_current_path()}\n"
+            
+    @command("exit", "exit", "выход из эмулятора")
+    def cmd_exit(self, args):
+        """Команда exit - выход из эмулятора"""
+        self.flush_log(wait=True)
+        self.quit()
+            
+    @command("help", "help", "эта справка")
+    def cmd_help(self, args):
+        """Команда help - показывает список доступных команд"""
+        yield self.commands.help_text()
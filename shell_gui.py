@@ -0,0 +1,249 @@
+"""
+Графический интерфейс эмулятора на tkinter
+"""
+
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import scrolledtext, Entry, Frame
+
+from shell_core import ShellCore
+
+
+class CommandWorker(threading.Thread):
+    """Фоновый поток, последовательно выполняющий задания эмулятора"""
+    def __init__(self, shell):
+        super().__init__(name="shell-worker", daemon=True)
+        self.shell = shell
+        self.jobs = queue.Queue()
+        self.busy = False
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+    def stop(self):
+        self.jobs.put(None)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            # Ctrl+C относится только к заданию, которое выполняется сейчас
+            self.shell.cancel_event.clear()
+            self.busy = True
+            try:
+                job()
+            except Exception as e:
+                self.shell.output(f"Внутренняя ошибка: {e}\n")
+            finally:
+                self.busy = False
+
+
+class ShellEmulator(ShellCore):
+    # Период опроса очереди сообщений от фонового потока, мс
+    POLL_INTERVAL = 20
+    # Сколько сообщений обрабатывается за один опрос
+    POLL_BATCH = 5000
+    
+    def __init__(self, root, vfs_path=None, log_file=None, startup_script=None, scrollback=10000,
+                 **options):
+        self.root = root
+        # Вывод копится в буфере и попадает в виджет один раз за цикл простоя Tk
+        self.scrollback = scrollback
+        self._output_buffer = []
+        self._flush_scheduled = False
+        # Команды выполняются в отдельном потоке, интерфейс получает от него
+        # сообщения через очередь и обрабатывает их в главном потоке
+        self._ui_queue = queue.Queue(maxsize=10000)
+        self._progress = None
+        self._shown_progress = None
+        super().__init__(vfs_path, log_file, startup_script, **options)
+        
+        # Установка заголовка окна
+        self.root.title(f"Эмулятор - [{self.username}@{self.hostname}]")
+        
+        # Создание интерфейса
+        self.create_widgets()
+        
+        # Приветствие и стартовый скрипт выполняются в фоне
+        self.worker = CommandWorker(self)
+        self.worker.start()
+        self.worker.submit(self.start)
+        self.root.after(self.POLL_INTERVAL, self.poll_ui_queue)
+        
+    def create_widgets(self):
+        # Основная рамка
+        main_frame = Frame(self.root)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # Область вывода с прокруткой
+        self.output_area = scrolledtext.ScrolledText(
+            main_frame, 
+            height=20, 
+            width=80,
+            bg='black',
+            fg='white',
+            insertbackground='white',
+            font=('Courier New', 10)
+        )
+        self.output_area.pack(fill=tk.BOTH, expand=True)
+        self.output_area.config(state=tk.DISABLED)
+        
+        # Рамка для ввода команды
+        input_frame = Frame(main_frame)
+        input_frame.pack(fill=tk.X, pady=5)
+        
+        # Приглашение командной строки
+        self.update_prompt()
+        
+        # Поле ввода команды
+        self.command_entry = Entry(
+            input_frame,
+            bg='black',
+            fg='white',
+            insertbackground='white',
+            font=('Courier New', 10),
+            width=60
+        )
+        self.command_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.command_entry.bind('<Return>', self.execute_command)
+        self.command_entry.focus()
+        self.root.bind('<Control-c>', self.interrupt)
+        
+        # Строка состояния для хода выполнения скриптов
+        self.status_label = tk.Label(main_frame, text="", anchor='w', font=('Courier New', 9))
+        self.status_label.pack(fill=tk.X)
+        
+    def update_prompt(self):
+        """Обновление приглашения командной строки"""
+        current_path = self.vfs.get_current_path()
+        short_path = current_path.replace('/home/user', '~') if current_path.startswith('/home/user') else current_path
+        
+        if hasattr(self, 'prompt_label'):
+            self.prompt_label.config(text=f"{self.username}@{self.hostname}:{short_path}$ ")
+        else:
+            self.prompt_label = tk.Label(
+                self.root.winfo_children()[0].winfo_children()[1],  # input_frame
+                text=f"{self.username}@{self.hostname}:{short_path}$ ",
+                bg='black',
+                fg='green',
+                font=('Courier New', 10, 'bold')
+            )
+            self.prompt_label.pack(side=tk.LEFT)
+        
+    def output_area_insert(self, text):
+        """Вставка текста в область вывода (отложенная до простоя Tk)"""
+        self._output_buffer.append(text)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.root.after_idle(self.flush_output)
+        
+    def flush_output(self):
+        """Перенос накопленного вывода в виджет одной вставкой"""
+        self._flush_scheduled = False
+        if not self._output_buffer:
+            return
+        
+        text = "".join(self._output_buffer)
+        self._output_buffer = []
+        
+        # Строки, которые все равно будут отрезаны ограничением, не вставляем
+        if self.scrollback and text.count("\n") > self.scrollback:
+            cut = len(text)
+            for _ in range(self.scrollback + 1):
+                cut = text.rfind("\n", 0, cut)
+            text = text[cut + 1:]
+        
+        self.output_area.config(state=tk.NORMAL)
+        self.output_area.insert(tk.END, text)
+        if self.scrollback:
+            # Удаляем самые старые строки сверх ограничения
+            line_count = int(self.output_area.index('end-1c').split('.')[0])
+            if line_count > self.scrollback:
+                self.output_area.delete('1.0', f'{line_count - self.scrollback + 1}.0')
+        self.output_area.config(state=tk.DISABLED)
+        self.output_area.see(tk.END)
+        
+    def poll_ui_queue(self):
+        """Обработка сообщений фонового потока в главном потоке Tk"""
+        try:
+            for _ in range(self.POLL_BATCH):
+                kind, value = self._ui_queue.get_nowait()
+                if kind == "output":
+                    self.output_area_insert(value)
+                elif kind == "prompt":
+                    self.update_prompt()
+                    self.output_area_insert(value)
+                elif kind == "quit":
+                    self.root.quit()
+        except queue.Empty:
+            pass
+        
+        progress = self._progress
+        if progress != self._shown_progress:
+            self._shown_progress = progress
+            self.status_label.config(text=progress or "")
+        
+        delay = 1 if not self._ui_queue.empty() else self.POLL_INTERVAL
+        self.root.after(delay, self.poll_ui_queue)
+        
+    def output(self, text):
+        self._ui_queue.put(("output", text))
+        
+    def show_prompt(self):
+        self._ui_queue.put(("prompt", self.prompt_text()))
+        
+    def quit(self):
+        super().quit()
+        self._ui_queue.put(("quit", None))
+        
+    def report_progress(self, task, done, total, unit="строка"):
+        # Строка состояния обновляется при очередном опросе очереди,
+        # поэтому частые вызовы не создают сообщений
+        if done is None:
+            self._progress = None
+        elif total is None:
+            self._progress = f"{task}: {unit} {done} (Ctrl+C - прервать)"
+        else:
+            self._progress = f"{task}: {unit} {done} из {total} (Ctrl+C - прервать)"
+        
+    def interrupt(self, event=None):
+        """Прерывание выполняемой команды или скрипта"""
+        if self.worker.busy:
+            self.cancel_event.set()
+        return "break"
+        
+    def execute_command(self, event):
+        command_text = self.command_entry.get().strip()
+        self.command_entry.delete(0, tk.END)
+        self.worker.submit(lambda: self.run_command(command_text))
+        
+    def run_command(self, command_text):
+        """Выполнение введенной команды в фоновом потоке"""
+        if not command_text:
+            self.show_prompt()
+            return
+            
+        self.output(f"{command_text}\n")
+        self.process_command(command_text)
+        self.flush_log()
+        if self.running:
+            self.show_prompt()
+        
+    def shutdown(self, timeout=2.0):
+        """Остановка фоновых потоков и закрытие лога"""
+        self.cancel_event.set()
+        self.stop_watcher()
+        self.worker.stop()
+        # Пока поток завершается, разбираем очередь, чтобы он не завис на ее заполнении
+        deadline = time.monotonic() + timeout
+        while self.worker.is_alive() and time.monotonic() < deadline:
+            try:
+                while True:
+                    self._ui_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.worker.join(0.05)
+        self.close_log()
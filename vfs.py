@@ -0,0 +1,1366 @@
+"""
+Виртуальная файловая система эмулятора
+"""
+
+import bisect
+import codecs
+import fnmatch
+import mmap
+import os
+import re
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Физические файлы от этого размера не читаются в память, а отображаются через mmap
+MMAP_THRESHOLD = 1024 * 1024
+# Размер порции при потоковой обработке содержимого (cat, wc)
+CHUNK_SIZE = 1024 * 1024
+
+
+class VFSNode:
+    """Узел виртуальной файловой системы"""
+    __slots__ = ('name', 'parent')
+    is_directory = False
+    children = None
+
+    def __init__(self, name):
+        # Имена повторяются во множестве директорий, поэтому интернируются
+        self.name = sys.intern(name)
+        self.parent = None
+
+def entry_key(name, node):
+    """Ключ сортировки записи ls: имя, у директорий - с '/' на конце"""
+    return name + '/' if node.is_directory else name
+
+class ChildMap(dict):
+    """Потомки директории: имя -> узел. После первого запроса sorted_keys()
+    отсортированный список ключей записей обновляется при каждой вставке
+    и удалении, поэтому ls не сортирует директорию заново"""
+    __slots__ = ('_order',)
+
+    def __init__(self):
+        super().__init__()
+        self._order = None
+
+    def sorted_keys(self):
+        """Ключи entry_key в порядке ls (список не копируется, не изменять)"""
+        if self._order is None:
+            self._order = sorted(entry_key(name, node) for name, node in self.items())
+        return self._order
+
+    def __setitem__(self, name, node):
+        order = self._order
+        if order is None:
+            dict.__setitem__(self, name, node)
+            return
+        old = self.get(name)
+        dict.__setitem__(self, name, node)
+        key = entry_key(name, node)
+        if old is not None:
+            old_key = entry_key(name, old)
+            if old_key == key:
+                return
+            del order[bisect.bisect_left(order, old_key)]
+        bisect.insort(order, key)
+
+    def __delitem__(self, name):
+        node = self[name]
+        dict.__delitem__(self, name)
+        if self._order is not None:
+            del self._order[bisect.bisect_left(self._order, entry_key(name, node))]
+
+    def pop(self, name, *default):
+        if name not in self:
+            return dict.pop(self, name, *default)
+        node = self[name]
+        del self[name]
+        return node
+
+    def setdefault(self, name, node=None):
+        if name not in self:
+            self[name] = node
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, node in dict(*args, **kwargs).items():
+            self[name] = node
+
+    def popitem(self):
+        self._order = None
+        return dict.popitem(self)
+
+    def clear(self):
+        self._order = None
+        dict.clear(self)
+
+class DirNode(VFSNode):
+    """Директория VFS"""
+    __slots__ = ('_children', '_pending', '_loader', '_stamp')
+    is_directory = True
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._children = ChildMap()
+        # Физические директории, еще не перенесенные в узел (ленивая загрузка)
+        self._pending = None
+        self._loader = None
+        # Отпечаток физической директории на момент загрузки (для resync):
+        # (путь, mtime_ns, {имя: (mtime_ns, размер) для файла или None для директории})
+        self._stamp = None
+
+    @property
+    def children(self):
+        if self._pending:
+            self._loader.materialize(self)
+        return self._children
+
+class FileNode(VFSNode):
+    """Файл VFS: содержимое хранится в UTF-8 или как ленивый дескриптор.
+    Содержимое неизменяемо, поэтому копии файла ссылаются на тот же объект"""
+    __slots__ = ('_data', '_stats')
+
+    def __init__(self, name, content=""):
+        super().__init__(name)
+        self._data = content.encode('utf-8') if isinstance(content, str) else content
+        # Статистика содержимого (как в wc), вычисляется при первом запросе
+        self._stats = None
+
+    @property
+    def data(self):
+        """Хранимое содержимое (байты или дескриптор)"""
+        return self._data
+
+    @property
+    def content(self):
+        data = self.data
+        if isinstance(data, bytes):
+            return data.decode('utf-8')
+        return data.read()
+
+    def share(self):
+        """Содержимое для новой копии файла: тот же неизменяемый объект, байты не копируются"""
+        return self._data
+
+    @property
+    def size(self):
+        """Размер содержимого в байтах"""
+        data = self.data
+        if isinstance(data, bytes):
+            return len(data)
+        if self._stats is not None:
+            return self._stats['bytes']
+        if isinstance(data, LazyContent):
+            return self.stats()['bytes']
+        return data.length
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Потоковое чтение содержимого порциями текста без полной копии"""
+        data = self.data
+        if isinstance(data, LazyContent):
+            yield data.read()
+            return
+        if isinstance(data, bytes):
+            if len(data) <= chunk_size:
+                yield data.decode('utf-8')
+                return
+            view = memoryview(data)
+        else:
+            view = data.view()
+
+        # Инкрементальный декодер корректно обрабатывает символы на границе порций
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        for start in range(0, len(view), chunk_size):
+            text = decoder.decode(view[start:start + chunk_size])
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def iter_lines(self):
+        """Строки содержимого без перевода строки, по порциям"""
+        return iter_lines(self.iter_chunks())
+
+    def stats(self):
+        """Число строк, слов, символов и байт (как в wc); считается один раз"""
+        if self._stats is None:
+            self._stats = self._count()
+        return dict(self._stats)
+
+    def _count(self):
+        """Подсчет статистики за один проход по порциям содержимого"""
+        stats = count_text(self.iter_chunks())
+        data = self.data
+        if isinstance(data, LazyContent):
+            stats['bytes'] = len(data.read().encode('utf-8'))
+        else:
+            stats['bytes'] = len(data) if isinstance(data, bytes) else data.length
+        return stats
+
+def iter_lines(chunks):
+    """Строки потока текстовых порций без символов перевода строки"""
+    tail = ""
+    for chunk in chunks:
+        lines = (tail + chunk).split('\n')
+        tail = lines.pop()
+        yield from lines
+    if tail:
+        yield tail
+
+def count_text(chunks, count_bytes=False):
+    """Число строк, слов и символов (и байт UTF-8 при count_bytes) в потоке
+    текстовых порций за один проход, как в wc"""
+    lines = words = chars = size = 0
+    prev_in_word = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        lines += chunk.count('\n')
+        chars += len(chunk)
+        if count_bytes:
+            size += len(chunk.encode('utf-8'))
+        chunk_words = len(chunk.split())
+        # Слово, разрезанное границей порций, считается один раз
+        if chunk_words and prev_in_word and not chunk[0].isspace():
+            chunk_words -= 1
+        words += chunk_words
+        prev_in_word = not chunk[-1].isspace()
+
+    stats = {
+        'lines': lines + 1 if chars else 0,
+        'words': words,
+        'chars': chars
+    }
+    if count_bytes:
+        stats['bytes'] = size
+    return stats
+
+def _class_end(pattern, start):
+    """Позиция ']', закрывающей класс символов, который начинается в start, или -1"""
+    i = start + 1
+    if i < len(pattern) and pattern[i] == '^':
+        i += 1
+    # ']' сразу после открывающей скобки входит в класс
+    if i < len(pattern) and pattern[i] == ']':
+        i += 1
+    while i < len(pattern):
+        if pattern[i] == '\\':
+            i += 2
+            continue
+        if pattern[i] == ']':
+            return i
+        i += 1
+    return -1
+
+def _escape_end(pattern, start):
+    """Позиция после escape-последовательности, буква или цифра которой стоит в start:
+    у \\x, \\u, \\U, \\N{...}, восьмеричных кодов и обратных ссылок есть аргумент"""
+    escaped = pattern[start]
+    end = start + 1
+    if escaped in 'xuU':
+        return end + {'x': 2, 'u': 4, 'U': 8}[escaped]
+    if escaped == 'N':
+        close = pattern.find('}', end)
+        return len(pattern) if close == -1 else close + 1
+    if escaped.isdigit():
+        octal = pattern[start:start + 3]
+        if escaped == '0':
+            # \0 и еще до двух восьмеричных цифр
+            while end < start + 3 and end < len(pattern) and pattern[end] in '01234567':
+                end += 1
+        elif len(octal) == 3 and all(c in '01234567' for c in octal):
+            end = start + 3
+        elif end < len(pattern) and pattern[end].isdigit():
+            # Обратная ссылка из двух цифр
+            end += 1
+    return end
+
+def regex_literal(pattern):
+    """Самая длинная строка, которая обязательно входит в любое совпадение
+    регулярного выражения (для отбора файлов по индексу), или None"""
+    if '|' in pattern:
+        return None
+    runs = []
+    run = ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\' and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            # \d, \w, \b, коды символов \x41 и т.п. прерывают строку вместе с аргументом,
+            # остальное - экранированный символ
+            if escaped.isalnum():
+                runs.append(run)
+                run = ""
+                i = _escape_end(pattern, i - 1)
+            elif depth == 0:
+                run += escaped
+            continue
+        if ch in '*?{':
+            if ch == '{':
+                # Квантификатор {m,n}; фигурная скобка без него - неочевидный случай
+                end = pattern.find('}', i)
+                if end == -1 or not re.fullmatch(r'\d*(,\d*)?', pattern[i + 1:end]):
+                    return None
+                i = end
+            # Предыдущий символ необязателен или повторяется
+            runs.append(run[:-1])
+            run = ""
+        elif ch == '[':
+            runs.append(run)
+            run = ""
+            end = _class_end(pattern, i)
+            if end == -1:
+                return None
+            i = end
+        elif ch == '(':
+            runs.append(run)
+            run = ""
+            depth += 1
+        elif ch == ')':
+            depth = max(depth - 1, 0)
+        elif ch in '.^$+':
+            runs.append(run)
+            run = ""
+        elif depth == 0:
+            run += ch
+        i += 1
+    runs.append(run)
+    literal = max(runs, key=len)
+    return literal if len(literal) >= 3 else None
+
+def line_matcher(pattern, regex=False, ignore_case=False):
+    """Проверка строки для grep и строка, обязательная для совпадения (или None)"""
+    if regex:
+        match = re.compile(pattern, re.IGNORECASE if ignore_case else 0).search
+        return match, regex_literal(pattern)
+    if ignore_case:
+        needle = pattern.lower()
+        return (lambda line: needle in line.lower()), pattern
+    return (lambda line: pattern in line), pattern
+
+def iter_tree(node, materialize=True):
+    """Обход поддерева в прямом порядке без рекурсии (глубина дерева не ограничена).
+    При materialize=False не загруженные с диска директории не читаются"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.is_directory:
+            children = node.children if materialize else node._children
+            # Потомки кладутся в обратном порядке, чтобы сохранить порядок директории
+            stack.extend(reversed(list(children.values())))
+
+class LazyContent:
+    """Содержимое физического файла, которое еще не прочитано"""
+    __slots__ = ('path', 'loader')
+
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+
+    def read(self):
+        return self.loader.read(self)
+
+class MappedContent:
+    """Содержимое файла как срез отображенного в память буфера (без копирования)"""
+    __slots__ = ('buffer', 'offset', 'length')
+
+    def __init__(self, buffer, offset, length):
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+
+    def view(self):
+        return memoryview(self.buffer)[self.offset:self.offset + self.length]
+
+    def read(self):
+        return str(self.view(), 'utf-8', 'replace')
+
+class MappedFile:
+    """Большой физический файл, отображаемый в память при первом обращении"""
+    __slots__ = ('path', '_buffer')
+
+    def __init__(self, path):
+        self.path = path
+        self._buffer = None
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size:
+                        self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    else:
+                        self._buffer = b""
+            except OSError:
+                # Файл удален или недоступен после загрузки VFS
+                self._buffer = b""
+        return self._buffer
+
+    @property
+    def length(self):
+        return len(self.buffer)
+
+    def view(self):
+        return memoryview(self.buffer)
+
+    def read(self):
+        return str(self.view(), 'utf-8', 'replace')
+
+class ContentCache:
+    """Ограниченный LRU-кэш содержимого лениво загружаемых файлов"""
+    def __init__(self, max_entries=1024, max_chars=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.total_chars = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        content = self._items.get(key)
+        if content is not None:
+            self._items.move_to_end(key)
+        return content
+
+    def put(self, key, content):
+        if key in self._items:
+            self.total_chars -= len(self._items.pop(key))
+        self._items[key] = content
+        self.total_chars += len(content)
+        # Вытесняем давно не использованные файлы, но последний оставляем всегда
+        while len(self._items) > 1 and (len(self._items) > self.max_entries
+                                        or self.total_chars > self.max_chars):
+            _, evicted = self._items.popitem(last=False)
+            self.total_chars -= len(evicted)
+
+class LazyLoader:
+    """Загрузка узлов VFS из физической директории по требованию"""
+    def __init__(self, vfs, cache=None):
+        self.vfs = vfs
+        self.cache = cache or ContentCache()
+
+    def attach(self, directory, physical_path):
+        """Отложенное подключение физической директории к узлу VFS"""
+        if directory._pending is None:
+            directory._pending = []
+        directory._pending.append(physical_path)
+        directory._loader = self
+
+    def materialize(self, directory):
+        """Перенос содержимого физических директорий в узел при первом обращении"""
+        pending, directory._pending = directory._pending, None
+        children = directory._children
+        # Загруженные узлы попадают в индекс find/grep, если он включен
+        index = self.vfs.index
+
+        for physical_dir in pending:
+            try:
+                mtime_ns = os.stat(physical_dir).st_mtime_ns
+                entries = list(os.scandir(physical_dir))
+            except OSError:
+                continue
+            # Отпечаток ведется только для директории из одного физического источника
+            stamps = {} if len(pending) == 1 else None
+            if stamps is not None:
+                directory._stamp = (physical_dir, mtime_ns, stamps)
+
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    node = children.get(entry.name)
+                    if node is None:
+                        node = DirNode(entry.name)
+                        node.parent = directory
+                        children[entry.name] = node
+                        if index is not None:
+                            index.add(node)
+                    elif not node.is_directory:
+                        continue
+                    # Как и os.walk, не заходим в символические ссылки на директории
+                    if not entry.is_symlink():
+                        self.attach(node, entry.path)
+                    if stamps is not None:
+                        stamps[entry.name] = None
+                else:
+                    try:
+                        st = entry.stat()
+                        large = st.st_size >= self.vfs.mmap_threshold
+                        stamp = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        large = False
+                        stamp = None
+                    content = MappedFile(entry.path) if large else LazyContent(entry.path, self)
+                    node = FileNode(entry.name, content)
+                    node.parent = directory
+                    if index is not None:
+                        replaced = children.get(entry.name)
+                        if replaced is not None:
+                            index.remove_tree(replaced)
+                        index.add(node)
+                    children[entry.name] = node
+                    if stamps is not None and stamp is not None:
+                        stamps[entry.name] = stamp
+
+    def read(self, handle):
+        """Чтение содержимого файла с диска через кэш"""
+        content = self.cache.get(handle)
+        if content is None:
+            try:
+                with open(handle.path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except:
+                content = f"Бинарный файл {os.path.basename(handle.path)}"
+            self.cache.put(handle, content)
+        return content
+
+class VirtualFileSystem:
+    """Виртуальная файловая система"""
+    HOME_PATH = "/home/user"
+    # Сколько разрешенных путей хранится в кэше
+    RESOLVE_CACHE_SIZE = 4096
+    # Через сколько узлов рекурсивные операции сообщают о ходе выполнения
+    PROGRESS_INTERVAL = 4096
+    # Через сколько файлов загрузка из физической директории сообщает о ходе выполнения
+    LOAD_PROGRESS_INTERVAL = 10000
+    # Потоков чтения файлов при загрузке (по умолчанию как в ThreadPoolExecutor)
+    LOAD_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+    def __init__(self, physical_path=None, lazy=False, root=None, mmap_threshold=MMAP_THRESHOLD,
+                 load_workers=None):
+        self.root = root if root is not None else DirNode("")
+        # Текущая директория и ее путь; путь поддерживается при смене директории,
+        # чтобы приглашение и лог не поднимались до корня на каждой команде
+        self._current_dir = self.root
+        self._current_path = "/"
+        # Кэш путь -> узел; сбрасывается при замене или удалении узлов
+        self._resolve_cache = OrderedDict()
+        self.physical_path = physical_path
+        self.mmap_threshold = mmap_threshold
+        self.load_workers = load_workers or self.LOAD_WORKERS
+        # Индекс имен и содержимого для find и grep (включается enable_index)
+        self.index = None
+        # Счетчик просмотренных узлов для профилирования команд
+        self.nodes_touched = 0
+        self.loader = LazyLoader(self) if lazy else None
+        
+        # Готовое дерево (например, из снимка) используется как есть
+        if root is not None:
+            return
+        
+        # Создаем базовую структуру VFS
+        self.create_default_structure()
+        
+        # Загружаем из физической директории если указана
+        if physical_path and os.path.exists(physical_path):
+            if lazy:
+                self.mount_lazy(physical_path)
+            else:
+                self.load_from_physical_path(physical_path)
+    
+    def create_default_structure(self):
+        """Создание базовой структуры VFS"""
+        # Создаем домашнюю директорию
+        home = self.mkdir("home", self.root)
+        user = self.mkdir("user", home)
+        
+        # Создаем несколько тестовых файлов и папок
+        documents = self.mkdir("documents", user)
+        downloads = self.mkdir("downloads", user)
+        temp = self.mkdir("temp", user)
+        
+        # Создаем тестовые файлы с разным содержимым
+        self.create_file("readme.txt", user, "Добро пожаловать в эмулятор!\nЭто файл readme.")
+        self.create_file("test.py", user, "print('Hello World')\n\nclass Test:\n    def method(self):\n        return True")
+        self.create_file("data.txt", user, "Строка 1\nСтрока 2\nСтрока 3\nСтрока 4\nСтрока 5")
+        self.create_file("empty.txt", user, "")
+        self.create_file("source.txt", temp, "Исходный файл для копирования\nСодержимое исходного файла")
+        
+        self.create_file("report.md", documents, "# Отчет\n\n## Раздел 1\nТекст раздела 1\n\n## Раздел 2\nТекст раздела 2")
+        self.create_file("notes.txt", documents, "Заметка 1\nЗаметка 2\nЗаметка 3")
+        
+        # Создаем тестовые директории для rmdir
+        self.mkdir("empty_dir", user)
+        self.mkdir("dir_with_files", user)
+        self.create_file("file1.txt", self.mkdir("dir_with_files", user), "Файл 1")
+        self.create_file("file2.txt", self.mkdir("dir_with_files", user), "Файл 2")
+        
+        # Создаем системуные директории
+        etc = self.mkdir("etc", self.root)
+        self.mkdir("var", self.root)
+        self.mkdir("tmp", self.root)
+        
+        # Создаем конфигурационные файлы
+        self.create_file("version", etc, "EmulatorOS 1.0")
+        self.create_file("hostname", etc, "emulator-host")
+    
+    def load_from_physical_path(self, physical_path, progress=None):
+        """Загрузка VFS из физической директории.
+        Директории обходятся и узлы связываются в одном потоке, файлы читаются
+        параллельно в пуле; результат тот же, что при последовательной загрузке"""
+        started = time.perf_counter()
+        report = progress or self._print_load_progress
+        try:
+            files, loaded_bytes = self._import([(physical_path, self.current_dir)], (), report)
+            print(f"VFS загружена из: {physical_path}")
+            report(files, loaded_bytes, time.perf_counter() - started)
+        except Exception as e:
+            print(f"Ошибка загрузки VFS: {e}")
+    
+    def _import(self, roots, files, report):
+        """Импорт физических поддеревьев roots [(путь, директория VFS)] и отдельных
+        файлов files [(путь, директория VFS, имя)]; возвращает (файлов, прочитано байт).
+        Для каждой директории и файла запоминается отпечаток для resync"""
+        started = time.perf_counter()
+        count = loaded_bytes = 0
+        
+        def link(entry):
+            # Файлы связываются строго в порядке обхода, а не завершения чтения
+            nonlocal count, loaded_bytes
+            future, parent, name = entry
+            content, size, stamp = future.result()
+            if content is None:
+                content = f"Бинарный файл {name}"
+            self.create_file(name, parent, content)
+            if parent._stamp is not None and stamp is not None:
+                parent._stamp[2][name] = stamp
+            count += 1
+            loaded_bytes += size
+            if count % self.LOAD_PROGRESS_INTERVAL == 0:
+                report(count, loaded_bytes, time.perf_counter() - started)
+        
+        in_flight = deque()
+        max_in_flight = self.load_workers * 4
+        
+        with ThreadPoolExecutor(max_workers=self.load_workers) as pool:
+            def submit(path, parent, name):
+                in_flight.append((pool.submit(self._read_physical_file, path), parent, name))
+                # Очередь чтений ограничена, чтобы не держать в памяти все файлы сразу
+                if len(in_flight) > max_in_flight:
+                    link(in_flight.popleft())
+            
+            for path, parent, name in files:
+                submit(path, parent, name)
+            
+            # Обход сверху вниз, как os.walk: сначала поддиректории, затем файлы
+            stack = list(reversed(roots))
+            while stack:
+                dir_path, vfs_dir = stack.pop()
+                try:
+                    mtime_ns = os.stat(dir_path).st_mtime_ns
+                    with os.scandir(dir_path) as it:
+                        entries = list(it)
+                except OSError:
+                    continue
+                stamps = {}
+                vfs_dir._stamp = (dir_path, mtime_ns, stamps)
+                
+                subdirs = []
+                file_entries = []
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    (subdirs if is_dir else file_entries).append(entry)
+                
+                walk_into = []
+                for entry in subdirs:
+                    node = self.mkdir(entry.name, vfs_dir)
+                    stamps[entry.name] = None
+                    # Символические ссылки на директории не обходятся, как в os.walk
+                    if not entry.is_symlink():
+                        walk_into.append((entry.path, node))
+                stack.extend(reversed(walk_into))
+                
+                for entry in file_entries:
+                    submit(entry.path, vfs_dir, entry.name)
+            
+            while in_flight:
+                link(in_flight.popleft())
+        
+        return count, loaded_bytes
+    
+    def _read_physical_file(self, path):
+        """Чтение файла в потоке пула: (содержимое или None для бинарного файла,
+        прочитано байт, отпечаток); отображаемые в память файлы при загрузке не читаются"""
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None, 0, None
+        try:
+            # Большие файлы не читаются, а отображаются в память при обращении
+            if st.st_size >= self.mmap_threshold:
+                return MappedFile(path), 0, stamp
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read().encode('utf-8'), st.st_size, stamp
+        except Exception:
+            return None, 0, stamp
+    
+    def resync(self, check_files=False, progress=None):
+        """Повторная синхронизация с физической директорией.
+        Проверяются только mtime директорий, загруженных с диска; изменившаяся
+        директория перечитывается: удаленные записи убираются, новые и измененные
+        (по mtime и размеру) загружаются. check_files - проверять файлы и в
+        неизменившихся директориях (запись в файл не меняет mtime директории)"""
+        counts = {'dirs': 0, 'added': 0, 'updated': 0, 'removed': 0}
+        new_roots = []
+        new_files = []
+        
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            stamp = directory._stamp
+            # Еще не прочитанная лениво загружаемая директория актуальна и так
+            if stamp is not None and not directory._pending:
+                counts['dirs'] += 1
+                self._resync_directory(directory, stamp, check_files, counts, new_roots, new_files)
+            stack.extend(child for child in directory._children.values() if child.is_directory)
+        
+        if new_roots or new_files:
+            report = progress or (lambda *args: None)
+            self._import(new_roots, new_files, report)
+        if counts['added'] or counts['updated'] or counts['removed']:
+            self._invalidate()
+        return counts
+    
+    def _resync_directory(self, directory, stamp, check_files, counts, new_roots, new_files):
+        """Сравнение одной директории с ее отпечатком; загрузка откладывается в new_roots/new_files"""
+        path, mtime_ns, stamps = stamp
+        try:
+            st = os.stat(path)
+            dir_changed = st.st_mtime_ns != mtime_ns
+            if dir_changed:
+                with os.scandir(path) as it:
+                    entries = list(it)
+        except OSError:
+            # Физическая директория исчезла: убираем все, что было загружено из нее
+            for name in list(stamps):
+                counts['removed'] += self._drop_child(directory, name)
+            directory._stamp = None
+            return
+        
+        if dir_changed:
+            present = {}
+            for entry in entries:
+                try:
+                    present[entry.name] = (entry, entry.is_dir())
+                except OSError:
+                    present[entry.name] = (entry, False)
+            
+            for name, file_stamp in list(stamps.items()):
+                found = present.get(name)
+                # Запись исчезла или сменила тип (файл <-> директория)
+                if found is None or found[1] != (file_stamp is None):
+                    counts['removed'] += self._drop_child(directory, name)
+                    del stamps[name]
+            
+            for name, (entry, is_dir) in present.items():
+                if name in stamps:
+                    continue
+                counts['added'] += 1
+                if is_dir:
+                    node = self.mkdir(name, directory)
+                    stamps[name] = None
+                    if node.is_directory and not entry.is_symlink():
+                        new_roots.append((entry.path, node))
+                else:
+                    # Отпечаток файла запишется при загрузке
+                    new_files.append((entry.path, directory, name))
+            directory._stamp = (path, st.st_mtime_ns, stamps)
+        
+        if dir_changed or check_files:
+            for name, file_stamp in stamps.items():
+                if file_stamp is None:
+                    continue
+                file_path = os.path.join(path, name)
+                try:
+                    fst = os.stat(file_path)
+                except OSError:
+                    continue
+                if (fst.st_mtime_ns, fst.st_size) != file_stamp:
+                    counts['updated'] += 1
+                    new_files.append((file_path, directory, name))
+    
+    def _drop_child(self, directory, name):
+        """Удаление узла, загруженного с диска, при синхронизации; число удаленных узлов"""
+        node = directory._children.pop(name, None)
+        if node is None:
+            return 0
+        self._on_node_removed(node)
+        removed = 0
+        for child in iter_tree(node, materialize=False):
+            if self.index is not None:
+                self.index.remove(child)
+            removed += 1
+        return removed
+    
+    def stale(self):
+        """Изменилась ли какая-либо загруженная с диска директория (только проверка,
+        дерево не меняется; может вызываться из фонового потока)"""
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            stamp = directory._stamp
+            if stamp is not None and not directory._pending:
+                try:
+                    if os.stat(stamp[0]).st_mtime_ns != stamp[1]:
+                        return True
+                except OSError:
+                    return True
+            stack.extend(child for child in list(directory._children.values())
+                         if child.is_directory)
+        return False
+    
+    @staticmethod
+    def _print_load_progress(files, loaded_bytes, elapsed):
+        """Вывод хода загрузки: число файлов и скорость чтения"""
+        elapsed = max(elapsed, 1e-9)
+        print(f"  файлов: {files}, {loaded_bytes / 2**20:.1f} МБ "
+              f"({files / elapsed:.0f} файлов/с, {loaded_bytes / 2**20 / elapsed:.1f} МБ/с)")
+    
+    def enable_index(self):
+        """Построение индекса имен и содержимого; дальше он поддерживается изменениями VFS"""
+        from vfs_index import VFSIndex
+        
+        # Индекс подключается после построения: при обходе лениво загружаемые
+        # директории читаются и не должны попасть в него дважды. Содержимое
+        # непрочитанных файлов не читается, grep проверяет такие файлы напрямую
+        index = VFSIndex()
+        index.build(self.root)
+        self.index = index
+        return index
+    
+    def mount_lazy(self, physical_path):
+        """Подключение физической директории без чтения файлов"""
+        self.loader.attach(self.current_dir, physical_path)
+        print(f"VFS подключена (ленивая загрузка) из: {physical_path}")
+    
+    def mkdir(self, name, parent=None):
+        """Создание директории в VFS"""
+        if parent is None:
+            parent = self.current_dir
+        
+        if not parent.is_directory:
+            return None
+        
+        if name in parent.children:
+            return parent.children[name]
+        
+        new_dir = DirNode(name)
+        new_dir.parent = parent
+        parent.children[name] = new_dir
+        if self.index is not None:
+            self.index.add(new_dir)
+        return new_dir
+    
+    def create_file(self, name, parent=None, content=""):
+        """Создание файла в VFS"""
+        if parent is None:
+            parent = self.current_dir
+        
+        if not parent.is_directory:
+            return None
+        
+        new_file = FileNode(name, content)
+        new_file.parent = parent
+        old_node = parent.children.get(name)
+        if old_node is not None:
+            # Существующий узел заменяется, закэшированные пути к нему устарели
+            if self.index is not None:
+                self.index.remove_tree(old_node)
+            self._invalidate()
+        parent.children[name] = new_file
+        if self.index is not None:
+            self.index.add(new_file)
+        return new_file
+    
+    def remove_directory(self, path):
+        """Удаление пустой директории из VFS"""
+        parent, name = self._split_path(path)
+        
+        if parent is None or not parent.is_directory or name not in parent.children:
+            return False, f"Директория '{path}' не найдена"
+        
+        node = parent.children[name]
+        
+        if not node.is_directory:
+            return False, f"'{path}' не является директорией"
+        
+        if node.children and len(node.children) > 0:
+            return False, f"Директория '{path}' не пуста"
+        
+        # Удаляем директорию
+        del parent.children[name]
+        if self.index is not None:
+            self.index.remove(node)
+        self._invalidate()
+        self._on_node_removed(node)
+        return True, f"Директория '{path}' удалена"
+    
+    def copy_file(self, source_path, target_path):
+        """Копирование файла в VFS"""
+        source_node = self.resolve(source_path)
+        
+        if source_node is None:
+            return False, f"Исходный файл '{source_path}' не найден"
+        
+        if source_node.is_directory:
+            return False, f"'{source_path}' является директорией (используйте cp -r)"
+        
+        # Копирование в существующую директорию сохраняет имя файла
+        target_parent, target_name = self._target_location(source_node, target_path)
+        if target_parent is None or not target_parent.is_directory:
+            return False, f"Целевая директория для '{target_path}' не найдена"
+        
+        self._copy_file_node(source_node, target_parent, target_name)
+        return True, f"Файл '{source_path}' скопирован в '{target_path}'"
+    
+    def _copy_file_node(self, source_node, parent, name):
+        """Копия файла в директории parent (заменяет файл с тем же именем)"""
+        # Копия ссылается на то же неизменяемое содержимое, что и исходный файл,
+        # поэтому посчитанная статистика переносится в копию
+        new_file = self.create_file(name, parent, source_node.share())
+        new_file._stats = source_node._stats
+        return new_file
+    
+    def _target_location(self, source_node, target_path):
+        """Директория и имя для копирования или перемещения source_node по пути target_path"""
+        target_node = self.resolve(target_path)
+        if target_node is not None and target_node.is_directory:
+            return target_node, source_node.name
+        return self._split_path(target_path)
+    
+    def write_file(self, path, chunks, append=False):
+        """Запись потока текстовых порций в файл VFS (перенаправление > и >>)"""
+        # '.', '..' и '~' в конце пути - это директории, а не имена нового файла
+        target = self.resolve(path)
+        if target is not None and target.is_directory:
+            return False, f"'{path}' является директорией"
+        
+        parent, name = self._split_path(path)
+        if parent is None or not parent.is_directory or name in ('', '.', '..', '~'):
+            return False, f"Директория для '{path}' не найдена"
+        
+        existing = parent.children.get(name)
+        
+        data = bytearray()
+        if append and existing is not None:
+            # Файл получает новый объект содержимого, копии сохраняют прежний
+            stored = existing.data
+            if isinstance(stored, bytes):
+                data += stored
+            else:
+                for chunk in existing.iter_chunks():
+                    data += chunk.encode('utf-8')
+        for chunk in chunks:
+            data += chunk.encode('utf-8')
+        
+        self.create_file(name, parent, bytes(data))
+        return True, f"Записано в '{path}'"
+    
+    def copy_tree(self, source_path, target_path, progress=None):
+        """Рекурсивное копирование файла или директории (cp -r).
+        Обход итеративный; файлы копий разделяют содержимое с исходными.
+        progress(число узлов) вызывается каждые PROGRESS_INTERVAL узлов"""
+        source_node = self.resolve(source_path)
+        if source_node is None:
+            return False, f"Исходный путь '{source_path}' не найден"
+        
+        target_parent, target_name = self._target_location(source_node, target_path)
+        if target_parent is None or not target_parent.is_directory:
+            return False, f"Целевая директория для '{target_path}' не найдена"
+        if target_parent.children.get(target_name) is source_node:
+            return False, f"'{source_path}' и '{target_path}' - один и тот же путь"
+        
+        # Копирование директории внутрь самой себя никогда не закончилось бы
+        ancestor = target_parent
+        while ancestor is not None:
+            if ancestor is source_node:
+                return False, f"Нельзя скопировать '{source_path}' в собственную поддиректорию"
+            ancestor = ancestor.parent
+        
+        files = dirs = 0
+        stack = [(source_node, target_parent, target_name)]
+        try:
+            while stack:
+                node, parent, name = stack.pop()
+                existing = parent.children.get(name)
+                
+                if not node.is_directory:
+                    # Файл не заменяет директорию с тем же именем, как и в cp
+                    if existing is None or not existing.is_directory:
+                        self._copy_file_node(node, parent, name)
+                        files += 1
+                else:
+                    dirs += 1
+                    if existing is not None and existing.is_directory:
+                        # В существующую директорию содержимое добавляется
+                        copy_dir = existing
+                    else:
+                        if existing is not None and self.index is not None:
+                            self.index.remove(existing)
+                        copy_dir = DirNode(name)
+                        copy_dir.parent = parent
+                        parent.children[name] = copy_dir
+                        if self.index is not None:
+                            self.index.add(copy_dir)
+                        # Еще не прочитанная с диска директория копируется без чтения
+                        if node._pending and not node._children:
+                            copy_dir._pending = list(node._pending)
+                            copy_dir._loader = node._loader
+                            continue
+                    for child_name, child in reversed(list(node.children.items())):
+                        stack.append((child, copy_dir, child_name))
+                
+                if progress is not None and (files + dirs) % self.PROGRESS_INTERVAL == 0:
+                    progress(files + dirs)
+        finally:
+            self.nodes_touched += files + dirs
+            self._invalidate()
+        
+        if not source_node.is_directory:
+            return True, f"Файл '{source_path}' скопирован в '{target_path}'"
+        return True, (f"Директория '{source_path}' скопирована в '{target_path}' "
+                      f"(файлов: {files}, директорий: {dirs})")
+    
+    def remove_tree(self, path, recursive=False, progress=None):
+        """Удаление файла, а при recursive - и директории со всем содержимым (rm -r)"""
+        parent, name = self._split_path(path)
+        
+        if parent is None or not parent.is_directory or name not in parent.children:
+            return False, f"'{path}' не найден"
+        
+        node = parent.children[name]
+        if node.is_directory and not recursive:
+            return False, f"'{path}' является директорией (используйте -r)"
+        
+        # Поддерево отсоединяется сразу, затем обходится для счетчиков и индекса.
+        # Не загруженные с диска директории не читаются
+        del parent.children[name]
+        self._invalidate()
+        self._on_node_removed(node)
+        
+        files = dirs = 0
+        index = self.index
+        for removed in iter_tree(node, materialize=False):
+            if removed.is_directory:
+                dirs += 1
+            else:
+                files += 1
+            if index is not None:
+                index.remove(removed)
+            if progress is not None and (files + dirs) % self.PROGRESS_INTERVAL == 0:
+                progress(files + dirs)
+        self.nodes_touched += files + dirs
+        
+        if not node.is_directory:
+            return True, f"Файл '{path}' удален"
+        return True, f"Директория '{path}' удалена (файлов: {files}, директорий: {dirs})"
+    
+    def move_node(self, source_path, target_path):
+        """Перемещение или переименование файла либо директории (mv)"""
+        source_node = self.resolve(source_path)
+        if source_node is None:
+            return False, f"Исходный путь '{source_path}' не найден"
+        if source_node is self.root:
+            return False, "Нельзя переместить корневую директорию"
+        
+        target_parent, target_name = self._target_location(source_node, target_path)
+        if target_parent is None or not target_parent.is_directory:
+            return False, f"Целевая директория для '{target_path}' не найдена"
+        
+        ancestor = target_parent
+        while ancestor is not None:
+            if ancestor is source_node:
+                return False, f"Нельзя переместить '{source_path}' в собственную поддиректорию"
+            ancestor = ancestor.parent
+        
+        existing = target_parent.children.get(target_name)
+        if existing is source_node:
+            return True, f"'{source_path}' перемещен в '{target_path}'"
+        if existing is not None:
+            if existing.is_directory:
+                if not source_node.is_directory or existing.children:
+                    return False, f"'{target_path}' уже существует"
+                self._on_node_removed(existing)
+            elif source_node.is_directory:
+                return False, f"Нельзя заменить файл '{target_path}' директорией"
+            if self.index is not None:
+                self.index.remove(existing)
+        
+        # Перемещение меняет только ссылки родителя: поддерево не обходится
+        old_name = source_node.name
+        del source_node.parent.children[old_name]
+        source_node.name = sys.intern(target_name)
+        source_node.parent = target_parent
+        target_parent.children[source_node.name] = source_node
+        # Индекс хранит узлы, а не пути, поэтому меняется только имя перемещенного узла
+        if self.index is not None and old_name != source_node.name:
+            self.index.rename(source_node, old_name)
+        
+        self._invalidate()
+        # Текущая директория могла оказаться внутри перемещенного поддерева
+        self._current_path = self.get_node_path(self._current_dir)
+        return True, f"'{source_path}' перемещен в '{target_path}'"
+    
+    @property
+    def current_dir(self):
+        return self._current_dir
+    
+    @current_dir.setter
+    def current_dir(self, node):
+        old_dir, old_path = self._current_dir, self._current_path
+        self._current_dir = node
+        
+        # Переход в дочернюю или родительскую директорию не требует подъема до корня
+        if node is old_dir:
+            return
+        if node.parent is old_dir:
+            self._current_path = f"{old_path.rstrip('/')}/{node.name}"
+        elif old_dir.parent is node:
+            self._current_path = old_path.rpartition('/')[0] or "/"
+        else:
+            self._current_path = self.get_node_path(node)
+    
+    def change_directory(self, path):
+        """Смена текущей директории в VFS"""
+        target_dir = self.resolve(path)
+        if target_dir is None or not target_dir.is_directory:
+            return False
+        
+        self.current_dir = target_dir
+        return True
+    
+    def _on_node_removed(self, node):
+        """Если удалена текущая директория или ее предок, переходим к ближайшему уцелевшему предку"""
+        current = self._current_dir
+        while current is not None and current is not node:
+            current = current.parent
+        if current is node:
+            self._current_dir = node.parent
+            self._current_path = self.get_node_path(node.parent)
+    
+    def resolve(self, path):
+        """Поиск узла по абсолютному или относительному пути"""
+        # Относительный путь зависит от текущей директории, она входит в ключ
+        key = path if path.startswith('/') else (self.current_dir, path)
+        cache = self._resolve_cache
+        
+        node = cache.get(key)
+        if node is not None:
+            cache.move_to_end(key)
+            self.nodes_touched += 1
+            return node
+        
+        node = self._walk(path)
+        if node is not None:
+            cache[key] = node
+            if len(cache) > self.RESOLVE_CACHE_SIZE:
+                cache.popitem(last=False)
+        return node
+    
+    def _walk(self, path):
+        """Проход по компонентам пути от корня или текущей директории"""
+        node = self.root if path.startswith('/') else self.current_dir
+        
+        for part in path.split('/'):
+            if not part:  # Пропускаем пустые части
+                continue
+            if not node.is_directory:
+                return None
+            
+            self.nodes_touched += 1
+            if part == "..":
+                if node.parent:
+                    node = node.parent
+            elif part == ".":
+                continue
+            elif part == "~":
+                # Домашняя директория (/home/user)
+                node = self._walk(self.HOME_PATH)
+                if node is None:
+                    return None
+            else:
+                node = node.children.get(part)
+                if node is None:
+                    return None
+        
+        return node
+    
+    def _split_path(self, path):
+        """Разделение пути на родительскую директорию и имя"""
+        head, sep, name = path.rstrip('/').rpartition('/')
+        if not sep:
+            return self.current_dir, name
+        return self.resolve(head or '/'), name
+    
+    def _invalidate(self):
+        """Сброс кэша путей после изменения структуры дерева"""
+        self._resolve_cache.clear()
+    
+    def get_current_path(self):
+        """Получение текущего пути в VFS"""
+        return self._current_path
+    
+    def get_node_path(self, node):
+        """Получение абсолютного пути узла"""
+        path_parts = []
+        current = node
+        
+        while current and current.parent:  # Поднимаемся до корня
+            path_parts.append(current.name)
+            current = current.parent
+        
+        return "/" + "/".join(reversed(path_parts)) if path_parts else "/"
+    
+    def list_directory(self, path=None, show_hidden=False, long_format=False):
+        """Список содержимого директории"""
+        entries = self.iter_directory(path, show_hidden, long_format)
+        return None if entries is None else list(entries)
+    
+    def iter_directory(self, path=None, show_hidden=False, long_format=False, offset=0, limit=None):
+        """Строки ls в порядке имен, начиная с offset-й и не больше limit.
+        Возвращает генератор или None, если директория не найдена"""
+        target_dir = self.resolve(path) if path else self.current_dir
+        
+        if target_dir is None or not target_dir.is_directory:
+            return None
+        
+        children = target_dir.children
+        order = children.sorted_keys()
+        # Скрытые записи ('.имя') идут в отсортированном списке подряд,
+        # их диапазон пропускается без просмотра
+        hidden_start = hidden_end = 0
+        if not show_hidden:
+            hidden_start = bisect.bisect_left(order, '.')
+            hidden_end = bisect.bisect_left(order, '/')
+        visible = len(order) - (hidden_end - hidden_start)
+        stop = visible if limit is None else min(visible, offset + limit)
+        
+        # Страница выбирается сразу: изменения директории во время вывода ее не сдвигают
+        keys = []
+        if offset < hidden_start:
+            keys = order[offset:min(stop, hidden_start)]
+        if stop > hidden_start:
+            skip = hidden_end - hidden_start
+            keys += order[max(offset, hidden_start) + skip:stop + skip]
+        return self._format_entries(children, keys, long_format)
+    
+    def _format_entries(self, children, keys, long_format):
+        for key in keys:
+            name = key[:-1] if key.endswith('/') else key
+            node = children.get(name)
+            if node is None:
+                continue
+            self.nodes_touched += 1
+            if long_format:
+                # Длинный формат: тип, размер, имя (у директорий - 4096)
+                if node.is_directory:
+                    yield f"drw-r--r-- 1 user user 4096 Jan 01 00:00 {key}"
+                else:
+                    yield f"-rw-r--r-- 1 user user {node.size} Jan 01 00:00 {key}"
+            else:
+                yield key
+    
+    def get_file_stats(self, filename):
+        """Получение статистики файла для wc"""
+        node = self.resolve(filename)
+        
+        if node is not None and not node.is_directory:
+            return node.stats()
+        
+        return None
+    
+    def find(self, path=None, name=None, kind=None, size=None):
+        """Поиск узлов (find): name - шаблон имени, kind - 'f' или 'd',
+        size - (знак '+', '-' или '=', байты). Возвращает отсортированные пути
+        или None, если начальная директория не найдена"""
+        start = self.resolve(path) if path else self.current_dir
+        if start is None:
+            return None
+        
+        # По индексу проверяются только узлы с подходящим именем
+        if self.index is not None and name is not None:
+            candidates = (node for node in self.index.find_names(name)
+                          if self._is_within(node, start))
+            name = None
+        else:
+            candidates = iter_tree(start)
+        
+        result = []
+        for node in candidates:
+            self.nodes_touched += 1
+            if name is not None and not fnmatch.fnmatchcase(node.name, name):
+                continue
+            if kind is not None and kind != ('d' if node.is_directory else 'f'):
+                continue
+            if size is not None:
+                if node.is_directory:
+                    continue
+                sign, limit = size
+                node_size = node.size
+                if (sign == '+' and node_size <= limit or sign == '-' and node_size >= limit
+                        or sign == '=' and node_size != limit):
+                    continue
+            result.append(self.get_node_path(node))
+        result.sort()
+        return result
+    
+    def grep(self, pattern, path=None, regex=False, ignore_case=False):
+        """Поиск строк по подстроке или регулярному выражению (grep).
+        Возвращает генератор (путь файла, номер строки, строка) или None,
+        если путь не найден; директории просматриваются рекурсивно"""
+        start = self.resolve(path) if path else self.current_dir
+        if start is None:
+            return None
+        
+        match, literal = line_matcher(pattern, regex, ignore_case)
+        
+        if not start.is_directory:
+            files = [start]
+        else:
+            candidates = None
+            if self.index is not None and literal is not None:
+                candidates = self.index.content_candidates(literal)
+            if candidates is not None:
+                # Индекс триграмм отсекает файлы, в которых строки быть не может
+                files = [node for node in candidates if self._is_within(node, start)]
+            else:
+                files = [node for node in iter_tree(start) if not node.is_directory]
+        
+        return self._grep_files(files, match)
+    
+    def _grep_files(self, files, match):
+        paths = sorted(((self.get_node_path(node), node) for node in files),
+                       key=lambda item: item[0])
+        self.nodes_touched += len(paths)
+        for file_path, node in paths:
+            for line_num, line in enumerate(node.iter_lines(), 1):
+                if match(line):
+                    yield file_path, line_num, line
+    
+    @staticmethod
+    def _is_within(node, ancestor):
+        """Находится ли узел внутри ancestor (или совпадает с ним)"""
+        while node is not None:
+            if node is ancestor:
+                return True
+            node = node.parent
+        return False
+    
+    def get_motd(self):
+        """Получение сообщения MOTD из корня VFS"""
+        if "motd" in self.root.children and not self.root.children["motd"].is_directory:
+            return self.root.children["motd"].content
+        return None
@@ -0,0 +1,176 @@
+"""
+Индекс VFS для команд find и grep
+
+Индекс имен: имя -> узлы с этим именем и два отсортированных списка различных
+имен (прямой и перевернутый), по которым шаблон вида 'abc*' или '*.txt'
+сужается двоичным поиском до нескольких имен.
+
+Индекс содержимого: триграмма (три символа в нижнем регистре) -> файлы, в которых
+она встречается. Подстрока длиной от трех символов проверяется только в файлах,
+содержащих все ее триграммы. Файлы больше TRIGRAM_MAX_BYTES, еще не прочитанные
+файлы ленивой VFS (--lazy) и файлы, отображенные в память (большие физические и
+загруженные из снимка), не индексируются и проверяются при каждом поиске:
+построение индекса не читает их содержимое.
+
+Индекс поддерживается операциями VirtualFileSystem (create_file, mkdir,
+copy_file, remove_directory, rm, mv, resync) и ленивой загрузкой директорий.
+"""
+
+import bisect
+import fnmatch
+
+from vfs import LazyContent, MappedContent, MappedFile, iter_tree
+
+
+# Файлы больше этого размера не попадают в индекс триграмм
+TRIGRAM_MAX_BYTES = 1024 * 1024
+
+WILDCARDS = '*?['
+
+
+def trigrams(text):
+    """Множество триграмм текста (без учета регистра)"""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def glob_literals(pattern):
+    """Постоянные начало и конец шаблона имени: 'file_*.txt' -> ('file_', '.txt')"""
+    positions = [i for i, ch in enumerate(pattern) if ch in WILDCARDS]
+    if not positions:
+        return pattern, pattern
+    prefix = pattern[:positions[0]]
+    # Конец шаблона после последнего '*', '?' или закрывающей скобки класса
+    last = max(pattern.rfind('*'), pattern.rfind('?'), pattern.rfind(']'))
+    return prefix, pattern[last + 1:]
+
+class VFSIndex:
+    """Индекс имен и триграмм содержимого узлов VFS"""
+    def __init__(self, trigram_max_bytes=TRIGRAM_MAX_BYTES):
+        self.trigram_max_bytes = trigram_max_bytes
+        self._names = {}
+        self._trigrams = {}
+        # Файлы вне индекса триграмм: проверяются при каждом поиске
+        self._unindexed = set()
+        # Отсортированные имена строятся заново только после изменения набора имен
+        self._sorted = None
+        self._sorted_reversed = None
+
+    def build(self, root):
+        """Индексация всего дерева"""
+        for node in iter_tree(root):
+            self.add(node)
+
+    def add(self, node):
+        """Добавление одного узла"""
+        nodes = self._names.get(node.name)
+        if nodes is None:
+            nodes = self._names[node.name] = set()
+            self._sorted = self._sorted_reversed = None
+        nodes.add(node)
+
+        if not node.is_directory:
+            # Размер непрочитанного файла известен только после чтения, а большие
+            # файлы и снимок отображаются в память - они не читаются ради индекса
+            if (isinstance(node.data, (LazyContent, MappedContent, MappedFile))
+                    or node.size > self.trigram_max_bytes):
+                self._unindexed.add(node)
+                return
+            postings = self._trigrams
+            for gram in trigrams(node.content):
+                files = postings.get(gram)
+                if files is None:
+                    files = postings[gram] = set()
+                files.add(node)
+
+    def add_tree(self, node):
+        """Добавление узла со всеми уже загруженными потомками"""
+        for child in iter_tree(node, materialize=False):
+            self.add(child)
+
+    def remove(self, node):
+        """Удаление одного узла"""
+        nodes = self._names.get(node.name)
+        if nodes is not None:
+            nodes.discard(node)
+            if not nodes:
+                del self._names[node.name]
+                self._sorted = self._sorted_reversed = None
+
+        if not node.is_directory:
+            if node in self._unindexed:
+                self._unindexed.discard(node)
+                return
+            # Содержимое узла не меняется на месте, поэтому его триграммы
+            # можно вычислить заново вместо хранения обратного индекса
+            postings = self._trigrams
+            for gram in trigrams(node.content):
+                files = postings.get(gram)
+                if files is not None:
+                    files.discard(node)
+                    if not files:
+                        del postings[gram]
+
+    def remove_tree(self, node):
+        """Удаление узла со всеми загруженными потомками"""
+        for child in iter_tree(node, materialize=False):
+            self.remove(child)
+
+    def rename(self, node, old_name):
+        """Перенос узла в индексе имен после переименования"""
+        nodes = self._names.get(old_name)
+        if nodes is not None:
+            nodes.discard(node)
+            if not nodes:
+                del self._names[old_name]
+        nodes = self._names.setdefault(node.name, set())
+        nodes.add(node)
+        self._sorted = self._sorted_reversed = None
+
+    def find_names(self, pattern):
+        """Узлы, имя которых соответствует шаблону (fnmatch, с учетом регистра)"""
+        if not any(ch in pattern for ch in WILDCARDS):
+            return set(self._names.get(pattern, ()))
+
+        if self._sorted is None:
+            self._sorted = sorted(self._names)
+            self._sorted_reversed = sorted(name[::-1] for name in self._names)
+
+        # Кандидаты - имена с нужным началом или концом, смотря что уже
+        prefix, suffix = glob_literals(pattern)
+        by_prefix = self._range(self._sorted, prefix)
+        by_suffix = self._range(self._sorted_reversed, suffix[::-1])
+        if len(by_prefix) <= len(by_suffix):
+            candidates = by_prefix
+        else:
+            candidates = [name[::-1] for name in by_suffix]
+
+        result = set()
+        for name in candidates:
+            if fnmatch.fnmatchcase(name, pattern):
+                result.update(self._names[name])
+        return result
+
+    @staticmethod
+    def _range(names, prefix):
+        """Срез отсортированного списка имен, начинающихся с prefix"""
+        if not prefix:
+            return names
+        start = bisect.bisect_left(names, prefix)
+        end = bisect.bisect_left(names, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        return names[start:end]
+
+    def content_candidates(self, literal):
+        """Файлы, которые могут содержать literal (без учета регистра),
+        или None, если строка слишком коротка для индекса триграмм"""
+        grams = trigrams(literal)
+        if not grams:
+            return None
+        postings = self._trigrams
+        # Пересечение начинается с самого короткого списка
+        lists = sorted((postings.get(gram, ()) for gram in grams), key=len)
+        result = set(lists[0])
+        for files in lists[1:]:
+            if not result:
+                break
+            result &= files
+        return result | self._unindexed
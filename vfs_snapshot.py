@@ -0,0 +1,217 @@
+"""
+Двоичный снимок VFS для быстрого запуска
+
+Формат файла (все числа little-endian):
+    заголовок     - сигнатура b'VFSS', версия, число узлов, смещения/размеры областей
+                    и физическая директория, из которой построено дерево
+    таблица узлов - по записи на узел: индекс родителя, имя в пуле, тип, содержимое
+                    и отпечаток (mtime, размер) узла, загруженного с диска
+    пул имен      - имена узлов и путь физической директории в UTF-8 без повторов
+    содержимое    - тела файлов в UTF-8 (одинаковые объекты записываются один раз)
+
+Узлы записаны в порядке обхода, родитель всегда раньше потомков. При загрузке файл
+отображается в память, и содержимое файлов становится срезами отображения без копирования.
+Отпечатки восстанавливаются в узлах, поэтому после загрузки работают stale и resync.
+"""
+
+import mmap
+import os
+import struct
+
+from vfs import DirNode, FileNode, MappedContent, VirtualFileSystem
+
+
+MAGIC = b'VFSS'
+VERSION = 2
+
+# сигнатура, версия, резерв, число узлов, смещение и размер таблицы узлов,
+# пула имен и области содержимого, смещение и длина пути физической директории в пуле
+HEADER = struct.Struct('<4sHHQQQQQQQQQ')
+# родитель, смещение имени, длина имени, тип (0 - директория, 1 - файл), флаги
+# отпечатка, смещение и длина содержимого, mtime_ns и размер физического файла
+NODE = struct.Struct('<IIIBB2xQQQQ')
+NO_PARENT = 0xFFFFFFFF
+
+# Узел записан в отпечатке родителя (файл - с mtime и размером)
+STAMPED = 1
+# Директория прочитана с диска, в записи - ее mtime
+SCANNED = 2
+
+
+class SnapshotError(Exception):
+    """Файл не является снимком VFS поддерживаемой версии"""
+
+
+def _iter_nodes(root):
+    """Обход дерева в прямом порядке без рекурсии: (узел, индекс родителя)"""
+    stack = [(root, NO_PARENT)]
+    index = 0
+    while stack:
+        node, parent_index = stack.pop()
+        # Лениво загружаемая директория читается до записи узла, вместе с отпечатком
+        children = list(node.children.values()) if node.is_directory else ()
+        yield node, parent_index
+        # Потомки кладутся в обратном порядке, чтобы сохранить порядок директории
+        for child in reversed(children):
+            stack.append((child, index))
+        index += 1
+
+def _node_stamp(node):
+    """Флаги, mtime_ns и размер отпечатка узла для записи в снимок"""
+    flags = mtime_ns = size = 0
+    parent_stamp = node.parent._stamp if node.parent is not None else None
+    if parent_stamp is not None and node.name in parent_stamp[2]:
+        flags |= STAMPED
+        file_stamp = parent_stamp[2][node.name]
+        if file_stamp is not None:
+            mtime_ns, size = file_stamp
+    if node.is_directory and node._stamp is not None:
+        flags |= SCANNED
+        mtime_ns = node._stamp[1]
+    return flags, mtime_ns, size
+
+def save_snapshot(vfs, path):
+    """Сохранение дерева VFS в двоичный снимок"""
+    names = bytearray()
+    name_offsets = {}
+    records = []
+    blobs = []
+    blob_offsets = {}
+    content_size = 0
+
+    for node, parent_index in _iter_nodes(vfs.root):
+        name_offset = name_offsets.get(node.name)
+        encoded_name = node.name.encode('utf-8')
+        if name_offset is None:
+            name_offset = name_offsets[node.name] = len(names)
+            names += encoded_name
+        flags, mtime_ns, stamp_size = _node_stamp(node)
+
+        if node.is_directory:
+            records.append(NODE.pack(parent_index, name_offset, len(encoded_name), 0,
+                                     flags, 0, 0, mtime_ns, 0))
+            continue
+
+        data = node.data
+        if hasattr(data, 'view'):
+            # Отображенное в память содержимое пишется без промежуточной копии
+            data = data.view()
+        elif not isinstance(data, bytes):
+            data = node.content.encode('utf-8')
+        # Копии файлов ссылаются на один объект содержимого и записываются один раз
+        content_offset = blob_offsets.get(id(node.data))
+        if content_offset is None:
+            content_offset = content_size
+            blob_offsets[id(node.data)] = content_offset
+            blobs.append(data)
+            content_size += data.nbytes if isinstance(data, memoryview) else len(data)
+        records.append(NODE.pack(parent_index, name_offset, len(encoded_name), 1,
+                                 flags, content_offset, node.size, mtime_ns, stamp_size))
+
+    # Путь источника сравнивается при следующем запуске с --vfs
+    source = os.path.abspath(vfs.physical_path).encode('utf-8') if vfs.physical_path else b""
+    source_offset = len(names)
+    names += source
+
+    nodes_offset = HEADER.size
+    nodes_size = len(records) * NODE.size
+    names_offset = nodes_offset + nodes_size
+    content_offset = names_offset + len(names)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(records),
+                            nodes_offset, nodes_size,
+                            names_offset, len(names),
+                            content_offset, content_size,
+                            source_offset, len(source)))
+        f.write(b"".join(records))
+        f.write(names)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return len(records)
+
+def load_snapshot(path):
+    """Загрузка VFS из двоичного снимка с отображением файла в память"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise SnapshotError(f"'{path}' не является снимком VFS")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        return _build_tree(buffer, path)
+    except SnapshotError:
+        buffer.close()
+        raise
+
+def _build_tree(buffer, path):
+    """Проверка областей снимка и построение дерева; SnapshotError при повреждении"""
+    (magic, version, _, node_count, nodes_offset, nodes_size, names_offset, names_size,
+     content_offset, content_size, source_offset, source_size) = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError(f"'{path}' не является снимком VFS версии {VERSION}")
+
+    # Обрезанный или поврежденный файл не должен доходить до распаковки записей
+    file_size = len(buffer)
+    if nodes_size != node_count * NODE.size:
+        raise SnapshotError(f"'{path}': размер таблицы узлов не соответствует числу узлов")
+    for offset, size in ((nodes_offset, nodes_size), (names_offset, names_size),
+                         (content_offset, content_size)):
+        if offset < HEADER.size or offset + size > file_size:
+            raise SnapshotError(f"'{path}' поврежден: область данных выходит за пределы файла")
+
+    names = buffer[names_offset:names_offset + names_size]
+    if source_offset + source_size > names_size:
+        raise SnapshotError(f"'{path}' поврежден: путь источника вне пула имен")
+    try:
+        source = names[source_offset:source_offset + source_size].decode('utf-8') or None
+    except UnicodeDecodeError:
+        raise SnapshotError(f"'{path}' поврежден: неверный путь источника")
+    name_cache = {}
+    nodes = []
+    table = memoryview(buffer)[nodes_offset:nodes_offset + nodes_size]
+
+    try:
+        for index, (parent_index, name_offset, name_len, kind, flags, offset, length,
+                    mtime_ns, stamp_size) in enumerate(NODE.iter_unpack(table)):
+            if (name_offset + name_len > names_size or kind not in (0, 1)
+                    or kind == 1 and offset + length > content_size):
+                raise SnapshotError(f"'{path}' поврежден: запись узла {index} вне областей файла")
+            name = name_cache.get((name_offset, name_len))
+            if name is None:
+                try:
+                    name = names[name_offset:name_offset + name_len].decode('utf-8')
+                except UnicodeDecodeError:
+                    raise SnapshotError(f"'{path}' поврежден: неверное имя узла {index}")
+                name_cache[(name_offset, name_len)] = name
+
+            if kind == 0:
+                node = DirNode(name)
+            else:
+                data = MappedContent(buffer, content_offset + offset, length) if length else b""
+                node = FileNode(name, data)
+
+            if parent_index != NO_PARENT:
+                # Родитель записан раньше потомка и является директорией
+                if parent_index >= index or not nodes[parent_index].is_directory:
+                    raise SnapshotError(f"'{path}' поврежден: неверный родитель узла {index}")
+                parent = nodes[parent_index]
+                node.parent = parent
+                parent._children[name] = node
+                # Отпечатки для resync: пути директорий восстанавливаются от источника
+                if flags & STAMPED and parent._stamp is not None:
+                    parent._stamp[2][name] = (mtime_ns, stamp_size) if kind else None
+                if flags & SCANNED and kind == 0 and parent._stamp is not None:
+                    node._stamp = (os.path.join(parent._stamp[0], name), mtime_ns, {})
+            elif index:
+                raise SnapshotError(f"'{path}' поврежден: второй корень в узле {index}")
+            elif flags & SCANNED and kind == 0 and source:
+                node._stamp = (source, mtime_ns, {})
+            nodes.append(node)
+    finally:
+        table.release()
+
+    if not nodes or not nodes[0].is_directory:
+        raise SnapshotError(f"'{path}' не содержит корневой директории")
+    return VirtualFileSystem(root=nodes[0], physical_path=source)